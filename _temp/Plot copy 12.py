@@ -4,14 +4,17 @@ import plotly.express as px
 import dash
 from dash import dcc, html, Input, Output, State, no_update
 import numpy as np
-from scipy.interpolate import griddata
+
+from cache import surface_interpolator, version
+from data import load_source
+from groups import Groups
+from mesh import meshes
+from traces import markers
+from typed import compact
 
 # --- 1. Загрузка и подготовка данных ---
 try:
-    df = pd.read_csv('_temp/source.csv')
-    df_cleaned = df.dropna(subset=['EquivalentChainLength', 'OnsetTemperature', 'TemperatureStep', 'FattyAcid'])
-    df_filtered = df_cleaned[df_cleaned['EquivalentChainLength'] % 1 != 0].copy()
-    df_plot = df_filtered.copy()
+    df_plot = load_source()
 except FileNotFoundError:
     print("Внимание: Файл '_temp/source.csv' не найден. Для демонстрации созданы случайные данные.")
     data = {
@@ -27,69 +30,30 @@ except FileNotFoundError:
     df_plot = pd.DataFrame(data)
 
 
+
 # --- 2. Функция для создания начальной фигуры ---
-def create_initial_figure():
+def create_initial_figure(surfaces):
     fig = go.Figure()
-    unique_fatty_acids = df_plot['FattyAcid'].unique()
+    # Строки отсортированы один раз: срезы по кислоте
+    groups = Groups(df_plot)
+    unique_fatty_acids = groups.keys
     colors = px.colors.qualitative.Plotly
     surface_trace_indices = []
 
     for i, acid in enumerate(unique_fatty_acids):
-        acid_df = df_plot[df_plot['FattyAcid'] == acid]
         acid_color = colors[i % len(colors)]
 
-        try:
-            grid_df = acid_df.pivot_table(
-                index='OnsetTemperature', columns='TemperatureStep', values='EquivalentChainLength'
-            )
-            y_grid_vals, z_grid_vals = grid_df.index.values, grid_df.columns.values
-            all_x, all_y, all_z, vertex_map = [], [], [], {}
-            v_idx = 0
-            for r_idx, y_val in enumerate(y_grid_vals):
-                for c_idx, z_val in enumerate(z_grid_vals):
-                    x_val = grid_df.loc[y_val, z_val]
-                    if pd.notna(x_val):
-                        all_x.append(x_val); all_y.append(y_val); all_z.append(z_val)
-                        vertex_map[(r_idx, c_idx)] = v_idx
-                        v_idx += 1
-
-            faces_i, faces_j, faces_k = [], [], []
-            for r_idx in range(len(y_grid_vals) - 1):
-                for c_idx in range(len(z_grid_vals) - 1):
-                    p1, p2, p3, p4 = (r_idx, c_idx), (r_idx, c_idx + 1), (r_idx + 1, c_idx + 1), (r_idx + 1, c_idx)
-                    if all(p in vertex_map for p in [p1, p2, p3, p4]):
-                        v1, v2, v3, v4 = vertex_map[p1], vertex_map[p2], vertex_map[p3], vertex_map[p4]
-                        faces_i.extend([v1, v1]); faces_j.extend([v2, v3]); faces_k.extend([v3, v4])
-
-            if faces_i:
-                fig.add_trace(go.Mesh3d(
-                    x=all_x, y=all_y, z=all_z,
-                    i=faces_i, j=faces_j, k=faces_k,
-                    color=acid_color, opacity=0.5,
-                    legendgroup=acid, name=acid, showlegend=False, hoverinfo='none',
-                    meta={'type': 'surface', 'acid': acid}
-                ))
-                surface_trace_indices.append(len(fig.data) - 1)
-
-        except Exception as e:
-            print(f"Не удалось создать поверхность для {acid}: {e}")
-
-        for step in acid_df['TemperatureStep'].unique():
-            step_df = acid_df[acid_df['TemperatureStep'] == step]
-            fig.add_trace(go.Scatter3d(
-                x=step_df['EquivalentChainLength'], y=step_df['OnsetTemperature'], z=step_df['TemperatureStep'],
-                mode='markers',
-                marker=dict(size=5, color=acid_color, symbol='circle', line=dict(color='black', width=1)),
-                legendgroup=acid, name=acid,
-                showlegend=bool(step == acid_df['TemperatureStep'].unique()[0]),
-                hovertext=step_df['FattyAcid'],
-                hovertemplate=
-                    '<b>%{hovertext}</b><br><br>' +
-                    'Equivalent Chain Length: %{x:.2f}<br>' +
-                    'Onset Temperature: %{y:.2f}<br>' +
-                    'Temperature Step: %{z:.2f}<extra></extra>',
-                meta={'type': 'scatter', 'acid': acid}
+        surface = surfaces[acid]
+        if len(surface['i']):
+            fig.add_trace(go.Mesh3d(
+                **surface,
+                color=acid_color, opacity=0.5,
+                legendgroup=acid, name=acid, showlegend=False, hoverinfo='none',
+                meta={'type': 'surface', 'acid': acid, 'version': version(surface['x'], surface['y'], surface['z'])}
             ))
+            surface_trace_indices.append(len(fig.data) - 1)
+
+        fig.add_trace(markers(groups[acid], acid, acid_color, meta={'type': 'scatter', 'acid': acid}))
 
     fig.update_layout(
         title='3D-график жирных кислот с поверхностью по сетке',
@@ -116,15 +80,26 @@ def create_initial_figure():
             )
         ]
     )
-    return fig
+    return compact(fig)
 
 # --- 3. Создание Dash приложения ---
+# Поверхности всех кислот строятся за один проход по сетке. Интерполяторы
+# строятся из этих вершин (ECL в float64) по ключу (кислота, версия) трейса,
+# а не из float32-координат фигуры, присланной браузером
+surface_meshes = meshes(df_plot)
+initial_figure = create_initial_figure(surface_meshes)
+vertices = {
+    (trace.meta['acid'], trace.meta['version']): surface_meshes[trace.meta['acid']]
+    for trace in initial_figure.data
+    if trace.meta and trace.meta.get('type') == 'surface'
+}
+
 app = dash.Dash(__name__)
 server = app.server
 
 app.layout = html.Div([
     html.H1("Интерактивный анализ пересечения поверхностей"),
-    dcc.Graph(id='main-graph', figure=create_initial_figure(), style={'height': '80vh'}),
+    dcc.Graph(id='main-graph', figure=initial_figure, style={'height': '80vh'}),
     html.Button('Найти пересечение видимых поверхностей', id='intersect-button', n_clicks=0, style={'marginTop': '10px'})
 ])
 
@@ -143,11 +118,14 @@ def find_and_draw_intersection(n_clicks, fig_dict):
         # ИСПРАВЛЕНО: Обращаемся к свойствам объекта напрямую (trace.meta, trace.visible)
         # а не через .get(), как у словаря.
         if hasattr(trace, 'meta') and trace.meta.get('type') == 'surface' and trace.visible in [True, None]:
+            key = (trace.meta['acid'], trace.meta['version'])
+            surface = vertices[key]
             visible_surfaces_data.append({
-                'x': np.array(trace.x),
-                'y': np.array(trace.y),
-                'z': np.array(trace.z),
-                'acid': trace.meta['acid']
+                'x': surface['x'],
+                'y': np.asarray(surface['y'], dtype=np.float64),
+                'z': np.asarray(surface['z'], dtype=np.float64),
+                'acid': trace.meta['acid'],
+                'key': key
             })
 
     if len(visible_surfaces_data) < 2:
@@ -172,9 +150,9 @@ def find_and_draw_intersection(n_clicks, fig_dict):
 
     interpolated_x_values = []
     for data in visible_surfaces_data:
-        points = np.vstack((data['y'], data['z'])).T
-        values = data['x']
-        grid_x = griddata(points, values, (grid_y, grid_z), method='linear')
+        # Триангуляция и интерполятор кислоты берутся из серверного кэша
+        interpolator = surface_interpolator(data['key'], data['x'], data['y'], data['z'])
+        grid_x = interpolator(grid_y, grid_z)
         interpolated_x_values.append(grid_x)
 
     stacked_x = np.stack(interpolated_x_values, axis=0)
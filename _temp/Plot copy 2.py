@@ -1,14 +1,10 @@
-import pandas as pd
 import plotly.express as px
 
-# Load the dataset
-df = pd.read_csv('_temp/experiment.csv')
+from data import load_experiment
+from typed import compact
 
-# Drop rows with missing values
-df_cleaned = df.dropna(subset=['ECL', 'OnsetTemperature', 'TemperatureStep'])
-
-# Filter out rows where ECL is a whole number
-df_filtered = df_cleaned[df_cleaned['ECL'] % 1 != 0].copy()
+# Load the dataset without missing values and whole-number ECL rows
+df_filtered = load_experiment()
 
 # Convert TemperatureStep to string for discrete symbols
 df_filtered['TemperatureStep'] = df_filtered['TemperatureStep'].astype(str)
@@ -27,7 +23,7 @@ fig = px.scatter_3d(
         'OnsetTemperature': 'Onset Temperature',
         'TemperatureStep': 'Temperature Step'
     },
-    hover_data=df.columns,
+    hover_data=[column for column in df_filtered.columns if column != 'Mode'],
     color_continuous_scale=px.colors.sequential.Viridis # Explicitly set a nice color scale
 )
 
@@ -44,4 +40,5 @@ fig.update_layout(
 )
 
 # Show the figure (this will be interactive in your environment)
+compact(fig)
 fig.show()
@@ -1,14 +1,11 @@
 import pandas as pd
 import plotly.express as px
 
-# Load the dataset
-df = pd.read_csv('_temp/experiment.csv')
+from data import load_experiment
+from typed import compact
 
-# Drop rows with missing values
-df_cleaned = df.dropna(subset=['ECL', 'OnsetTemperature', 'TemperatureStep'])
-
-# Filter out rows where ECL is a whole number
-df_filtered = df_cleaned[df_cleaned['ECL'] % 1 != 0].copy()
+# Load the dataset without missing values and whole-number ECL rows
+df_filtered = load_experiment()
 
 # --- Key Change: Bin OnsetTemperature into discrete groups ---
 # This creates a new categorical column that can be used for a clickable legend.
@@ -58,4 +55,5 @@ fig.update_layout(
 )
 
 # Show the figure (this will be interactive in your environment)
+compact(fig)
 fig.show()
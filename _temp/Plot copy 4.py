@@ -1,20 +1,15 @@
-import pandas as pd
 import plotly.express as px
 
-# Load the dataset
-df = pd.read_csv('_temp/experiment.csv')
+from data import load_experiment
+from typed import compact
 
-# Drop rows with missing values
-df_cleaned = df.dropna(subset=['ECL', 'OnsetTemperature', 'TemperatureStep'])
-
-# Filter out rows where ECL is a whole number
-df_filtered = df_cleaned[df_cleaned['ECL'] % 1 != 0].copy()
+# Load the dataset without missing values and whole-number ECL rows
+df_filtered = load_experiment()
 
 # --- Key Change: Convert BOTH columns to string type for categorical legends ---
 df_filtered['TemperatureStep'] = df_filtered['TemperatureStep'].astype(str)
 df_filtered['OnsetTemperature'] = df_filtered['OnsetTemperature'].astype(str)
 
-
 # Create the interactive 3D scatter plot
 fig = px.scatter_3d(
     df_filtered,
@@ -29,7 +24,7 @@ fig = px.scatter_3d(
         'OnsetTemperature': 'Onset Temperature',
         'TemperatureStep': 'Temperature Step'
     },
-    hover_data=df_cleaned.columns # Show original (numeric) data on hover
+    hover_data=[column for column in df_filtered.columns if column != 'Mode'] # Show original (numeric) data on hover
 )
 
 # Update layout for better legend placement
@@ -45,4 +40,5 @@ fig.update_layout(
 )
 
 # Show the figure (this will be interactive in your environment)
+compact(fig)
 fig.show()
@@ -1,17 +1,11 @@
-import pandas as pd
 import plotly.express as px
 
-# Load the new dataset
-df = pd.read_csv('_temp/source.csv')
+from data import load_source
+from typed import compact
 
-# Drop rows where EquivalentChainLength is missing, as they cannot be plotted.
-df_cleaned = df.dropna(subset=['EquivalentChainLength'])
-
-# Filter out rows where ECL is a whole number
-df_filtered = df_cleaned[df_cleaned['EquivalentChainLength'] % 1 != 0].copy()
-
-# Create a copy for modifications to avoid SettingWithCopyWarning
-df_plot = df_filtered.copy()
+# Load the new dataset without missing values and whole-number ECL rows.
+# The loader returns a fresh frame, so it can be modified without a copy.
+df_plot = load_source()
 
 # --- Key Change: Create NEW columns for categorical data ---
 # This avoids the name ambiguity error. The original columns remain numeric.
@@ -58,4 +52,5 @@ fig.update_layout(
 )
 
 # Show the figure (this will be interactive in your environment)
+compact(fig)
 fig.show()
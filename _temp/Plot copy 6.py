@@ -1,15 +1,12 @@
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
-# Load the new dataset
-df = pd.read_csv('_temp/source.csv')
+from data import load_source
+from groups import Groups
+from typed import compact
 
-# Drop rows where key values are missing
-df_cleaned = df.dropna(subset=['EquivalentChainLength', 'OnsetTemperature', 'TemperatureStep', 'FattyAcid'])
-
-# Create a copy for modifications
-df_plot = df_cleaned.copy()
+# Load the new dataset without rows where key values are missing
+df_plot = load_source(fractional=False)
 
 # Convert TemperatureStep to a categorical variable for symbols
 df_plot['TemperatureStep_cat'] = df_plot['TemperatureStep'].astype(str)
@@ -40,11 +37,13 @@ fig = px.scatter_3d(
 
 # --- Add line traces for each FattyAcid ---
 # This allows us to control their visibility independently
-unique_fatty_acids = df_plot['FattyAcid'].unique()
+# Строки отсортированы один раз: срезы по кислоте
+groups = Groups(df_plot)
+unique_fatty_acids = groups.keys
 lines_to_add = []
 
 for acid in unique_fatty_acids:
-    acid_df = df_plot[df_plot['FattyAcid'] == acid].sort_values(by=['TemperatureStep', 'OnsetTemperature'])
+    acid_df = groups[acid].sort_values(by=['TemperatureStep', 'OnsetTemperature'])
     
     line_trace = go.Scatter3d(
         x=acid_df['EquivalentChainLength'],
@@ -106,4 +105,5 @@ fig.update_layout(
 )
 
 # Show the figure
+compact(fig)
 fig.show()
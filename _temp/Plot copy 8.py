@@ -1,19 +1,23 @@
-import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 import numpy as np
 from scipy.spatial import Delaunay
 
+from data import load_source
+from groups import Groups
+from traces import markers
+from typed import compact
+
 # Загрузка и подготовка данных
-df = pd.read_csv('_temp/source.csv')
-df_cleaned = df.dropna(subset=['EquivalentChainLength', 'OnsetTemperature', 'TemperatureStep', 'FattyAcid'])
-df_plot = df_cleaned.copy()
+df_plot = load_source(fractional=False)
 
 # --- Создание фигуры ---
 fig = go.Figure()
 
 # Получаем список уникальных кислот и назначаем им цвета
-unique_fatty_acids = df_plot['FattyAcid'].unique()
+# Строки отсортированы один раз: срезы по кислоте
+groups = Groups(df_plot)
+unique_fatty_acids = groups.keys
 colors = px.colors.qualitative.Plotly
 
 # Создаем словарь для сопоставления TemperatureStep и символов
@@ -24,7 +28,7 @@ symbol_map = {step: symbols[i % len(symbols)] for i, step in enumerate(unique_te
 
 # --- Добавляем данные на график в цикле ---
 for i, acid in enumerate(unique_fatty_acids):
-    acid_df = df_plot[df_plot['FattyAcid'] == acid]
+    acid_df = groups[acid]
     acid_color = colors[i % len(colors)]
 
     x_coords = acid_df['EquivalentChainLength']
@@ -59,27 +63,7 @@ for i, acid in enumerate(unique_fatty_acids):
 
     # --- Добавляем точки (маркеры) поверх плоскостей или линий ---
     # Эта логика остается неизменной
-    for step in acid_df['TemperatureStep'].unique():
-        step_df = acid_df[acid_df['TemperatureStep'] == step]
-        
-        fig.add_trace(go.Scatter3d(
-            x=step_df['EquivalentChainLength'],
-            y=step_df['OnsetTemperature'],
-            z=step_df['TemperatureStep'],
-            mode='markers',
-            marker=dict(
-                size=5, color=acid_color, symbol=symbol_map[step],
-                line=dict(color='black', width=1)
-            ),
-            legendgroup=acid, name=acid,
-            showlegend=bool(step == acid_df['TemperatureStep'].unique()[0]),
-            hovertext=step_df['FattyAcid'],
-            hovertemplate=
-                '<b>%{hovertext}</b><br><br>' +
-                'Equivalent Chain Length: %{x:.2f}<br>' +
-                'Onset Temperature: %{y:.2f}<br>' +
-                'Temperature Step: %{z:.2f}<extra></extra>'
-        ))
+    fig.add_trace(markers(acid_df, acid, acid_color, symbols=symbol_map))
 
 
 # --- Настройка общего вида графика ---
@@ -100,4 +84,5 @@ fig.update_layout(
 )
 
 # Показываем график
+compact(fig)
 fig.show()
\ No newline at end of file
@@ -1,14 +1,10 @@
-import pandas as pd
 import plotly.express as px
 
-# Load the dataset
-df = pd.read_csv('_temp/experiment.csv')
+from data import load_experiment
+from typed import compact
 
-# Drop rows with missing values in the key columns for plotting
-df_cleaned = df.dropna(subset=['ECL', 'OnsetTemperature', 'TemperatureStep'])
-
-# Filter out rows where ECL is a whole number
-df_filtered = df_cleaned[df_cleaned['ECL'] % 1 != 0].copy()
+# Load the dataset without missing values and whole-number ECL rows
+df_filtered = load_experiment()
 
 # Convert TemperatureStep to string to ensure it's treated as a discrete category for symbols
 df_filtered['TemperatureStep'] = df_filtered['TemperatureStep'].astype(str)
@@ -27,7 +23,7 @@ fig = px.scatter_3d(
         'OnsetTemperature': 'Onset Temperature',
         'TemperatureStep': 'Temperature Step'
     },
-    hover_data=df.columns  # This line includes all columns in the hover tooltip
+    hover_data=[column for column in df_filtered.columns if column != 'Mode']  # This line includes all columns in the hover tooltip
 )
 
 # Update layout for better appearance
@@ -37,4 +33,5 @@ fig.update_layout(
 )
 
 # Show the figure
+compact(fig)
 fig.show()
@@ -1,12 +1,10 @@
-import pandas as pd
 from mpl_toolkits.mplot3d import Axes3D
 import matplotlib.pyplot as plt
 
-# Load the dataset
-df = pd.read_csv('_temp/experiment.csv')
+from data import load_experiment
 
-# Drop rows with missing values in the relevant columns for plotting
-df_cleaned = df.dropna(subset=['ECL', 'OnsetTemperature', 'TemperatureStep'])
+# Load the dataset
+df_cleaned = load_experiment(fractional=False)
 
 # Create a 3D plot
 fig = plt.figure(figsize=(10, 8))
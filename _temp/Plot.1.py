@@ -1,16 +1,16 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 import numpy as np
 
-# Load the dataset
-df = pd.read_csv('_temp/experiment.csv')
+from data import load_experiment
+from groups import Groups
 
-# Drop rows with missing values
-df_cleaned = df.dropna(subset=['ECL', 'OnsetTemperature', 'TemperatureStep'])
+# Load the dataset
+df_cleaned = load_experiment(fractional=False)
 
 # Get unique values for TemperatureStep
-unique_temp_steps = sorted(df_cleaned['TemperatureStep'].unique())
+steps = Groups(df_cleaned, by='TemperatureStep', sort=True)
+unique_temp_steps = steps.keys
 colors = plt.get_cmap('tab10')(np.linspace(0, 1, len(unique_temp_steps)))
 markers = ['o', 's', '^', 'D', 'v', '<', '>', 'p', '*', 'h']
 
@@ -20,7 +20,7 @@ ax = fig.add_subplot(111, projection='3d')
 
 # Plot each group with a different color and marker
 for i, step in enumerate(unique_temp_steps):
-    subset = df_cleaned[df_cleaned['TemperatureStep'] == step]
+    subset = steps[step]
     ax.scatter(subset['ECL'], subset['OnsetTemperature'], subset['TemperatureStep'], 
                color=colors[i], 
                marker=markers[i % len(markers)], 
@@ -1,21 +1,21 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 import numpy as np
 from matplotlib.lines import Line2D
 
-# Load the dataset
-df = pd.read_csv('_temp/experiment.csv')
+from data import load_experiment
+from groups import Groups
 
-# Drop rows with missing values
-df_cleaned = df.dropna(subset=['ECL', 'OnsetTemperature', 'TemperatureStep'])
+# Load the dataset
+df_cleaned = load_experiment(fractional=False)
 
 # --- Plotting ---
 fig = plt.figure(figsize=(14, 12))
 ax = fig.add_subplot(111, projection='3d')
 
 # Define markers for each TemperatureStep
-unique_temp_steps = sorted(df_cleaned['TemperatureStep'].unique())
+steps = Groups(df_cleaned, by='TemperatureStep', sort=True)
+unique_temp_steps = steps.keys
 markers = ['o', 's', '^', 'D', 'v', '<', '>', 'p', '*', 'h']
 marker_map = {step: markers[i % len(markers)] for i, step in enumerate(unique_temp_steps)}
 
@@ -27,7 +27,7 @@ cmap = plt.get_cmap('viridis')
 # We can create a single mappable object for the colorbar.
 sc_plot = None
 for step in unique_temp_steps:
-    subset = df_cleaned[df_cleaned['TemperatureStep'] == step]
+    subset = steps[step]
     sc_plot = ax.scatter(subset['ECL'], subset['OnsetTemperature'], subset['TemperatureStep'],
                          c=subset['OnsetTemperature'],
                          cmap=cmap,
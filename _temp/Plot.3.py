@@ -1,24 +1,21 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 import numpy as np
 from matplotlib.lines import Line2D
 
-# Load the dataset
-df = pd.read_csv('_temp/experiment.csv')
+from data import load_experiment
+from groups import Groups
 
-# Drop rows with missing values
-df_cleaned = df.dropna(subset=['ECL', 'OnsetTemperature', 'TemperatureStep'])
-
-# Filter out rows where ECL is a whole number
-df_filtered = df_cleaned[df_cleaned['ECL'] % 1 != 0]
+# Load the dataset without missing values and whole-number ECL rows
+df_filtered = load_experiment()
 
 # --- Plotting ---
 fig = plt.figure(figsize=(14, 12))
 ax = fig.add_subplot(111, projection='3d')
 
 # Define markers for each TemperatureStep
-unique_temp_steps = sorted(df_filtered['TemperatureStep'].unique())
+steps = Groups(df_filtered, by='TemperatureStep', sort=True)
+unique_temp_steps = steps.keys
 markers = ['o', 's', '^', 'D', 'v', '<', '>', 'p', '*', 'h']
 marker_map = {step: markers[i % len(markers)] for i, step in enumerate(unique_temp_steps)}
 
@@ -28,7 +25,7 @@ cmap = plt.get_cmap('viridis')
 # Plot the data
 sc_plot = None
 for step in unique_temp_steps:
-    subset = df_filtered[df_filtered['TemperatureStep'] == step]
+    subset = steps[step]
     if not subset.empty:
         sc_plot = ax.scatter(subset['ECL'], subset['OnsetTemperature'], subset['TemperatureStep'],
                              c=subset['OnsetTemperature'],
@@ -1,19 +1,27 @@
+import os
+import time
+
+import diskcache
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 import dash
-from dash import dcc, html, Input, Output, State, no_update
+from dash import dcc, html, ctx, DiskcacheManager, Input, Output, State, Patch, no_update
 import numpy as np
-from scipy.interpolate import LinearNDInterpolator
-import matplotlib.pyplot as plt
-from itertools import combinations
 
-# --- 1. Загрузка и подготовка данных (без изменений) ---
+from data import CACHE, load_source
+from groups import Groups
+from cache import surface_grid, version
+from distance import critical, overlay
+from inversion import inversions, overlay as inversion_overlay
+from intersection import align, intersect_all
+from mesh import meshes
+from traces import markers
+from typed import compact, encode
+
+# --- 1. Загрузка и подготовка данных ---
 try:
-    df = pd.read_csv('_temp/source.csv')
-    df_cleaned = df.dropna(subset=['EquivalentChainLength', 'OnsetTemperature', 'TemperatureStep', 'FattyAcid'])
-    df_filtered = df_cleaned[df_cleaned['EquivalentChainLength'] % 1 != 0].copy()
-    df_plot = df_filtered.copy()
+    df_plot = load_source()
 except FileNotFoundError:
     print("Внимание: Файл '_temp/source.csv' не найден. Для демонстрации созданы случайные данные.")
     data = {
@@ -29,69 +37,53 @@ except FileNotFoundError:
     df_plot = pd.DataFrame(data)
 
 
-# --- 2. Функция для создания начальной фигуры (без изменений) ---
-def create_initial_figure():
+# Число критических (ближайших по ECL) пар каждого режима на графике:
+# отрезки между точками пары включаются в легенде
+CRITICAL_PAIRS = 1
+
+
+# --- 2. Функция для создания начальной фигуры ---
+def create_initial_figure(surfaces):
     fig = go.Figure()
-    unique_fatty_acids = df_plot['FattyAcid'].unique()
+    # Строки отсортированы один раз: срезы по кислоте
+    groups = Groups(df_plot)
+    unique_fatty_acids = groups.keys
     colors = px.colors.qualitative.Plotly
     surface_trace_indices = []
 
     for i, acid in enumerate(unique_fatty_acids):
-        acid_df = df_plot[df_plot['FattyAcid'] == acid]
         acid_color = colors[i % len(colors)]
 
-        try:
-            grid_df = acid_df.pivot_table(
-                index='OnsetTemperature', columns='TemperatureStep', values='EquivalentChainLength'
-            )
-            y_grid_vals, z_grid_vals = grid_df.index.values, grid_df.columns.values
-            all_x, all_y, all_z, vertex_map = [], [], [], {}
-            v_idx = 0
-            for r_idx, y_val in enumerate(y_grid_vals):
-                for c_idx, z_val in enumerate(z_grid_vals):
-                    x_val = grid_df.loc[y_val, z_val]
-                    if pd.notna(x_val):
-                        all_x.append(x_val); all_y.append(y_val); all_z.append(z_val)
-                        vertex_map[(r_idx, c_idx)] = v_idx
-                        v_idx += 1
-
-            faces_i, faces_j, faces_k = [], [], []
-            for r_idx in range(len(y_grid_vals) - 1):
-                for c_idx in range(len(z_grid_vals) - 1):
-                    p1, p2, p3, p4 = (r_idx, c_idx), (r_idx, c_idx + 1), (r_idx + 1, c_idx + 1), (r_idx + 1, c_idx)
-                    if all(p in vertex_map for p in [p1, p2, p3, p4]):
-                        v1, v2, v3, v4 = vertex_map[p1], vertex_map[p2], vertex_map[p3], vertex_map[p4]
-                        faces_i.extend([v1, v1]); faces_j.extend([v2, v3]); faces_k.extend([v3, v4])
-
-            if faces_i:
-                fig.add_trace(go.Mesh3d(
-                    x=all_x, y=all_y, z=all_z,
-                    i=faces_i, j=faces_j, k=faces_k,
-                    color=acid_color, opacity=0.5,
-                    legendgroup=acid, name=acid, showlegend=False, hoverinfo='none',
-                    meta={'type': 'surface', 'acid': acid}
-                ))
-                surface_trace_indices.append(len(fig.data) - 1)
-
-        except Exception as e:
-            print(f"Не удалось создать поверхность для {acid}: {e}")
-
-        for step in acid_df['TemperatureStep'].unique():
-            step_df = acid_df[acid_df['TemperatureStep'] == step]
-            fig.add_trace(go.Scatter3d(
-                x=step_df['EquivalentChainLength'], y=step_df['OnsetTemperature'], z=step_df['TemperatureStep'],
-                mode='markers',
-                marker=dict(size=5, color=acid_color, symbol='circle', line=dict(color='black', width=1)),
-                legendgroup=acid, name=acid,
-                showlegend=bool(step == acid_df['TemperatureStep'].unique()[0]),
-                hovertext=step_df['FattyAcid'],
-                hovertemplate=
-                    '<b>%{hovertext}</b><br><br>' +
-                    'Equivalent Chain Length: %{x:.2f}<br>' +
-                    'Onset Temperature: %{y:.2f}<br>' +
-                    'Temperature Step: %{z:.2f}<extra></extra>',
-                meta={'type': 'scatter', 'acid': acid}
+        surface = surfaces[acid]
+        if len(surface['i']):
+            fig.add_trace(go.Mesh3d(
+                **surface,
+                color=acid_color, opacity=0.5,
+                legendgroup=acid, name=acid, showlegend=False, hoverinfo='none',
+                meta={'type': 'surface', 'acid': acid, 'version': version(surface['x'], surface['y'], surface['z'])}
             ))
+            surface_trace_indices.append(len(fig.data) - 1)
+
+        fig.add_trace(markers(groups[acid], acid, acid_color, meta={'type': 'scatter', 'acid': acid}))
+
+    # Единственный трейс линий пересечения: callback меняет только его координаты
+    fig.add_trace(go.Scatter3d(
+        x=[], y=[], z=[],
+        mode='lines',
+        line=dict(color='red', width=10),
+        name='Intersection',
+        showlegend=False,
+        meta={'type': 'intersection'}
+    ))
+
+    critical_pairs = overlay(critical(df_plot, k=CRITICAL_PAIRS))
+    critical_pairs.update(visible='legendonly', name=f'Critical pairs (k={CRITICAL_PAIRS})')
+    fig.add_trace(critical_pairs)
+
+    # Ребра решетки, на которых пара кислот меняет порядок элюирования
+    order_inversions = inversion_overlay(inversions(df_plot))
+    order_inversions.update(visible='legendonly')
+    fig.add_trace(order_inversions)
 
     fig.update_layout(
         title='3D-график жирных кислот с поверхностью по сетке',
@@ -118,111 +110,201 @@ def create_initial_figure():
             )
         ]
     )
-    return fig
+    return compact(fig)
+
+# --- 3. Создание Dash приложения ---
+# Фигура строится один раз и хранится на сервере: браузер присылает только
+# видимость поверхностей, а callback возвращает Patch с координатами
+# единственного трейса пересечений.
+# Поверхности всех кислот строятся за один проход по сетке. Сетки
+# пересечений строятся из этих вершин (ECL в float64), compact() уменьшает
+# только копию в фигуре, которая уходит в браузер
+surface_meshes = meshes(df_plot)
+figure = create_initial_figure(surface_meshes)
+surfaces = [
+    (index, trace.meta['acid'], (trace.meta['acid'], trace.meta['version']),
+     *(surface_meshes[trace.meta['acid']][axis] for axis in 'xyz'))
+    for index, trace in enumerate(figure.data)
+    if trace.meta and trace.meta.get('type') == 'surface'
+]
+intersection_index = next(
+    index for index, trace in enumerate(figure.data)
+    if trace.meta and trace.meta.get('type') == 'intersection'
+)
+# Сетки строятся заранее: фоновые задачи запускаются в дочерних процессах
+# и получают заполненный кэш от сервера
+for _, _, key, x, y, z in surfaces:
+    surface_grid(key, x, y, z)
+
+# Фоновые задачи без брокера: очередь и прогресс хранятся в diskcache
+background_manager = DiskcacheManager(diskcache.Cache(os.path.join(CACHE, 'jobs')))
+# Не чаще, чем раз в PROGRESS_INTERVAL секунд, задача отдает прогресс и готовые линии
+PROGRESS_INTERVAL = 0.25
 
-# --- 3. Создание Dash приложения (без изменений) ---
 app = dash.Dash(__name__)
 server = app.server
 
 app.layout = html.Div([
     html.H1("Интерактивный анализ пересечения поверхностей"),
-    dcc.Graph(id='main-graph', figure=create_initial_figure(), style={'height': '80vh'}),
-    html.Button('Найти пересечение видимых поверхностей', id='intersect-button', n_clicks=0, style={'marginTop': '10px'})
+    dcc.Graph(id='main-graph', figure=figure, style={'height': '80vh'}),
+    # Видимость трейсов поверхностей: {номер трейса: visible}
+    dcc.Store(id='visibility', data={str(index): True for index, *_ in surfaces}),
+    # Линии пересечения: промежуточные (по мере готовности пар) и итоговые
+    dcc.Store(id='partial-lines'),
+    dcc.Store(id='intersection-lines'),
+    html.Button('Найти пересечение видимых поверхностей', id='intersect-button', n_clicks=0, style={'marginTop': '10px'}),
+    html.Div(id='intersection-progress', style={'marginTop': '10px'})
 ])
 
-# --- 4. Callback с НОВЫМ алгоритмом поиска пересечения ---
+
+# --- 4. Callbacks ---
 @app.callback(
-    Output('main-graph', 'figure'),
-    Input('intersect-button', 'n_clicks'),
-    State('main-graph', 'figure'),
+    Output('visibility', 'data'),
+    Input('main-graph', 'restyleData'),
+    State('visibility', 'data'),
     prevent_initial_call=True
 )
-def find_and_draw_intersection(n_clicks, fig_dict):
-    fig = go.Figure(fig_dict)
+def track_visibility(restyle_data, visibility):
+    # restyleData = [{'visible': значение или список}, [номера трейсов] или None]
+    if not restyle_data or 'visible' not in restyle_data[0]:
+        return no_update
+    values, indices = restyle_data[0]['visible'], restyle_data[1]
+    if indices is None:
+        indices = range(len(figure.data))
+    if not isinstance(values, list):
+        values = [values] * len(indices)
+    changed = False
+    for index, value in zip(indices, values):
+        if str(index) in visibility and visibility[str(index)] != value:
+            visibility[str(index)] = value
+            changed = True
+    return visibility if changed else no_update
 
-    # Сначала удаляем старые линии пересечения
-    fig.data = [trace for trace in fig.data if trace.name != 'Intersection']
 
+@app.callback(
+    Output('intersection-lines', 'data'),
+    Input('intersect-button', 'n_clicks'),
+    State('visibility', 'data'),
+    background=True,
+    manager=background_manager,
+    progress=[Output('partial-lines', 'data'), Output('intersection-progress', 'children')],
+    running=[(Output('intersect-button', 'disabled'), True, False)],
+    # Изменение видимости отменяет расчет: результат был бы уже неактуален
+    cancel=[Input('visibility', 'data')],
+    prevent_initial_call=True
+)
+def find_and_draw_intersection(set_progress, n_clicks, visibility):
     # --- Шаг А: Найти видимые поверхности ---
-    visible_surfaces = []
-    for trace in fig.data:
-        if hasattr(trace, 'meta') and trace.meta.get('type') == 'surface' and trace.visible in [True, None]:
-            visible_surfaces.append(trace)
+    visible_surfaces = [
+        surface for surface in surfaces
+        if visibility.get(str(surface[0]), True) in [True, None]
+    ]
 
     if len(visible_surfaces) < 2:
         print("Для поиска пересечения необходимо как минимум 2 видимые поверхности.")
-        return fig # Возвращаем фигуру с удаленными старыми линиями
+        # Пустые линии убирают старые пересечения
+        return {'x': encode([]), 'y': encode([]), 'z': encode([]), 'segments': 0}
 
     print(f"Найдено {len(visible_surfaces)} видимых поверхностей. Идет расчет пересечений...")
 
-    # --- Шаг Б: Итерируемся по всем парам видимых поверхностей ---
-    total_segments_found = 0
-    for surf_A, surf_B in combinations(visible_surfaces, 2):
-        print(f"  - Ищем пересечение между '{surf_A.meta['acid']}' и '{surf_B.meta['acid']}'")
-
-        # --- Шаг В: Создаем интерполяторы для каждой поверхности x = f(y, z) ---
-        points_A = np.vstack((surf_A.y, surf_A.z)).T
-        values_A = surf_A.x
-        interp_A = LinearNDInterpolator(points_A, values_A)
-
-        points_B = np.vstack((surf_B.y, surf_B.z)).T
-        values_B = surf_B.x
-        interp_B = LinearNDInterpolator(points_B, values_B)
-
-        # --- Шаг Г: Определяем общую область для анализа ---
-        min_y = max(points_A[:, 0].min(), points_B[:, 0].min())
-        max_y = min(points_A[:, 0].max(), points_B[:, 0].max())
-        min_z = max(points_A[:, 1].min(), points_B[:, 1].min())
-        max_z = min(points_A[:, 1].max(), points_B[:, 1].max())
-
-        if min_y >= max_y or min_z >= max_z:
-            print("    - Поверхности не пересекаются в плоскости Y-Z.")
-            continue
-
-        # --- Шаг Д: Создаем сетку и находим разницу высот (X) ---
-        grid_y_1d = np.linspace(min_y, max_y, 100)
-        grid_z_1d = np.linspace(min_z, max_z, 100)
-        grid_yy, grid_zz = np.meshgrid(grid_y_1d, grid_z_1d)
-
-        x_A_on_grid = interp_A((grid_yy, grid_zz))
-        x_B_on_grid = interp_B((grid_yy, grid_zz))
-
-        # Разница высот. Ищем где она равна 0
-        diff_grid = x_A_on_grid - x_B_on_grid
-
-        # --- Шаг Е: Используем Matplotlib для поиска контура, где разница = 0 ---
-        # plt.contour не рисует график, а вычисляет координаты линий
-        cs = plt.contour(grid_y_1d, grid_z_1d, diff_grid, levels=[0])
-        
-        # allsegs[0] содержит все найденные отрезки для уровня 0
-        intersection_segments = cs.allsegs[0]
-        
-        if not any(s.any() for s in intersection_segments):
-            print("    - Линия пересечения не найдена.")
-            continue
-
-        # --- Шаг Ж: Добавляем найденные линии на график ---
-        for seg in intersection_segments:
-            if len(seg) < 2: continue # Нужна хотя бы линия из 2 точек
-            
-            # seg содержит координаты (y, z)
-            seg_y, seg_z = seg[:, 0], seg[:, 1]
-            # Находим для них координату x (можно использовать любой интерполятор)
-            seg_x = interp_A(seg_y, seg_z)
-
-            # Добавляем разрыв в линии (None), чтобы Plotly не соединял отдельные сегменты
-            fig.add_trace(go.Scatter3d(
-                x=seg_x, y=seg_y, z=seg_z,
-                mode='lines',
-                line=dict(color='red', width=10),
-                name='Intersection',
-                showlegend=False
-            ))
-            total_segments_found += 1
-    
-    plt.close('all') # Закрываем фигуры matplotlib, чтобы они не отображались
-    print(f"Расчет завершен. Найдено и отрисовано {total_segments_found} сегментов пересечения.")
-    return fig
+    # --- Шаг Б: Сетки всех видимых поверхностей x = f(y, z) на общей решетке (y, z) ---
+    # Сетки берутся из серверного кэша по (кислота, версия) и не перестраиваются между нажатиями
+    y_axis, z_axis, grids = align(*(
+        surface_grid(key, x, y, z)
+        for _, _, key, x, y, z in visible_surfaces
+    ))
+
+    # --- Шаг В: Пересечения всех пар ---
+    # Пары с неперекрывающимися диапазонами ECL (целиком и по ячейкам) отбрасываются,
+    # для остальных считается точный нулевой уровень разности. Линии каждой
+    # готовой пары сразу добавляются в один трейс, разделенные разрывами (NaN).
+    # Прогресс передает только линии, готовые после прошлого прогресса.
+    pieces = {'x': [], 'y': [], 'z': []}
+    segments = 0
+    sent = 0
+    reported = time.monotonic()
+
+    def lines():
+        # Все линии в типизированных массивах float32, готовых для трейса
+        result = {axis: encode(np.concatenate(values) if values else []) for axis, values in pieces.items()}
+        result['segments'] = segments
+        return result
+
+    def new_lines():
+        # Линии после прошлого прогресса списками (разрыв - None): draw_intersection
+        # дописывает их в трейс, а первый прогресс расчета заменяет старые линии
+        nonlocal sent
+        result = {'segments': segments, 'reset': sent == 0}
+        for axis, values in pieces.items():
+            added = np.concatenate(values[sent:]) if len(values) > sent else np.empty(0)
+            result[axis] = np.where(np.isnan(added), None, added).tolist()
+        sent = len(pieces['x'])
+        return result
+
+    def progress(pair, intersection_lines, done, total):
+        nonlocal reported, segments
+        a, b = pair
+        if intersection_lines:
+            print(f"  - Пересечение '{visible_surfaces[a][1]}' и '{visible_surfaces[b][1]}'")
+        for line in intersection_lines:
+            if len(line['x']) < 2: continue # Нужна хотя бы линия из 2 точек
+            for axis, values in pieces.items():
+                values.extend([line[axis], [np.nan]])
+            segments += 1
+        if set_progress is not None and (done == total or time.monotonic() - reported >= PROGRESS_INTERVAL):
+            reported = time.monotonic()
+            set_progress((new_lines(), f"Пары поверхностей: {done} из {total}"))
+
+    # Задача уже выполняется в отдельном процессе, поэтому пары считаются в нем
+    # последовательно: отмена завершает процесс без оставшихся дочерних пулов
+    intersect_all(grids, y_axis, z_axis, processes=0, progress=progress)
+
+    print(f"Расчет завершен. Найдено и отрисовано {segments} сегментов пересечения.")
+    return lines()
+
+
+@app.callback(
+    Output('main-graph', 'figure'),
+    Output('intersection-progress', 'children', allow_duplicate=True),
+    Input('partial-lines', 'data'),
+    Input('intersection-lines', 'data'),
+    prevent_initial_call=True
+)
+def draw_intersection(partial_lines, intersection_lines):
+    # Меняются только координаты трейса пересечений, остальная фигура не пересылается
+    lines = intersection_lines if ctx.triggered_id == 'intersection-lines' else partial_lines
+    if not lines:
+        return no_update, no_update
+    patch = Patch()
+    trace = patch['data'][intersection_index]
+    if ctx.triggered_id == 'intersection-lines':
+        for axis in 'xyz':
+            trace[axis] = lines[axis]
+        return patch, f"Найдено сегментов пересечения: {lines['segments']}"
+    for axis in 'xyz':
+        if lines['reset']:
+            trace[axis] = lines[axis]
+        elif lines[axis]:
+            trace[axis].extend(lines[axis])
+    return patch, no_update
+
+
+@app.callback(
+    Output('main-graph', 'figure', allow_duplicate=True),
+    Output('intersection-progress', 'children', allow_duplicate=True),
+    Input('visibility', 'data'),
+    State('intersect-button', 'disabled'),
+    prevent_initial_call=True
+)
+def clear_partial_lines(visibility, running):
+    # Изменение видимости во время расчета отменяет его: промежуточные линии
+    # неактуальны и убираются с графика
+    if not running:
+        return no_update, no_update
+    patch = Patch()
+    for axis in 'xyz':
+        patch['data'][intersection_index][axis] = []
+    return patch, "Расчет отменен"
 
 # --- 5. Запуск сервера (без изменений) ---
 if __name__ == '__main__':
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+import ipc
+
+# --- Разбор подписей жирных кислот "{18,[{9,-1,1}, {12,-1,1}]}" ---
+# Подпись - число атомов углерода и список связей {положение, изомерия,
+# ненасыщенность}. Разбираются только уникальные подписи столбца (один
+# проход регулярными выражениями pandas по всем связям сразу), строки
+# получают канонический код - номер кислоты. Массивы связей хранятся как в
+# ipc.read(): (offsets, values) на кислоту.
+#
+# В source.csv длинные списки сокращены: "{20,[{5,1,1}, {8,1,1}, … {17,1,1}]}".
+# Пропущенные связи восстанавливаются по метиленовому интервалу между
+# первыми двумя: 5, 8, (11, 14), 17 - с изомерией и ненасыщенностью второй.
+
+CARBONS = r'^\{(\d+),'
+BOUND = r'\{(\d+),(-?\d+),(-?\d+)\}'
+ELLIPSIS = '…'
+
+
+class FattyAcids:
+    """Структурный вид столбца подписей.
+
+    codes - канонический код каждой строки (номер кислоты в labels); массивы
+    carbons, double_bonds и offsets - по кислотам; index, isomerism и
+    unsaturation - связи всех кислот подряд, связи кислоты n - срез
+    offsets[n]:offsets[n + 1]. Одинаковые кислоты с полной и сокращенной
+    подписью получают один код.
+    """
+
+    def __init__(self, values):
+        row_codes, uniques = pd.factorize(pd.Series(values, copy=False))
+        uniques = pd.Series(np.asarray(uniques, dtype=object), dtype=str)
+        carbons = uniques.str.extract(CARBONS, expand=False).astype(np.uint8).to_numpy()
+        bounds = uniques.str.extractall(BOUND).astype(np.int8)
+        # Без единой связи extractall дает пустые столбцы object: типы явно
+        owner, index, isomerism, unsaturation = _expand(
+            bounds.index.get_level_values(0).to_numpy().astype(np.intp),
+            *(bounds[column].to_numpy().astype(np.int8) for column in range(3)),
+            uniques.str.contains(ELLIPSIS, regex=False).to_numpy(),
+        )
+        counts = np.bincount(owner, minlength=len(uniques))
+        # Каноническая подпись (без сокращений): коды в порядке первого появления
+        codes, labels = pd.factorize(np.asarray(ipc.labels({
+            'FattyAcid.Carbons': carbons,
+            'FattyAcid.Unsaturated.offsets': np.concatenate([[0], np.cumsum(counts)]),
+            'FattyAcid.Unsaturated.Index': index,
+            'FattyAcid.Unsaturated.Isomerism': isomerism,
+            'FattyAcid.Unsaturated.Unsaturation': unsaturation,
+        }), dtype=object))
+        # Первая уникальная подпись каждой кислоты; номера растут вместе с кодами
+        first = np.unique(codes, return_index=True)[1]
+        keep = np.isin(owner, first)
+
+        self.labels = list(labels)
+        self.codes = np.where(row_codes < 0, -1, codes[row_codes]).astype(np.int32)
+        self.carbons = carbons[first]
+        self.double_bonds = np.bincount(owner[unsaturation == 1], minlength=len(uniques))[first].astype(np.uint8)
+        self.offsets = np.concatenate([[0], np.cumsum(counts[first])])
+        self.index = index[keep].astype(np.uint8)
+        self.isomerism = isomerism[keep]
+        self.unsaturation = unsaturation[keep]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def positions(self, code):
+        """Положения связей кислоты code."""
+        return self.index[self.offsets[code]:self.offsets[code + 1]]
+
+    def categorical(self):
+        """Канонические подписи строк как pd.Categorical (коды - те же codes)."""
+        return pd.Categorical.from_codes(self.codes, categories=self.labels)
+
+    def mask(self, carbons=None, double_bonds=None):
+        """Строки с заданным числом атомов углерода и/или двойных связей.
+
+        Сравнение целых чисел по кислотам, затем выборка по кодам строк.
+        """
+        selected = np.ones(len(self), dtype=bool)
+        if carbons is not None:
+            selected &= self.carbons == carbons
+        if double_bonds is not None:
+            selected &= self.double_bonds == double_bonds
+        return np.append(selected, False)[self.codes]
+
+
+def _expand(owner, index, isomerism, unsaturation, truncated):
+    # Вставка пропущенных связей после второй связи сокращенных подписей
+    counts = np.bincount(owner, minlength=len(truncated))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rows = np.flatnonzero(truncated & (counts >= 3))
+    if not len(rows):
+        return owner, index, isomerism, unsaturation
+    second = starts[rows] + 1
+    last = starts[rows] + counts[rows] - 1
+    step = index[second].astype(np.int64) - index[second - 1]
+    missing = np.maximum((index[last].astype(np.int64) - index[second]) // np.maximum(step, 1) - 1, 0)
+    # Номер вставки внутри своей подписи: 1, 2, ..., missing
+    number = np.arange(missing.sum()) - np.repeat(np.cumsum(missing) - missing, missing) + 1
+    source = np.repeat(second, missing)
+    inserted_index = index[source] + np.repeat(step, missing) * number
+    position = np.concatenate([np.arange(len(owner)), source + number / (missing.max() + 1)])
+    order = np.argsort(position, kind='stable')
+    return (
+        np.concatenate([owner, owner[source]])[order],
+        np.concatenate([index, inserted_index.astype(index.dtype)])[order],
+        np.concatenate([isomerism, isomerism[source]])[order],
+        np.concatenate([unsaturation, unsaturation[source]])[order],
+    )
@@ -0,0 +1,190 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+import ipc
+import ron
+from chain import chain_lengths
+from cube import Cube
+from intersection import bounds, candidates, intersect
+
+# --- Бутстреп повторностей: доверительные полосы поверхностей и пересечений ---
+# В каждой выборке повторности времени удерживания каждой строки
+# (ron.load(), столбец Time) выбираются с возвращением, по их среднему
+# заново считаются ECL (chain.chain_lengths), и результат раскладывается в
+# куб (кислоты x T0 x шаг) решетки cube.Cube. Вместо каталога ron повторности
+# берутся и из файла Arrow IPC (ipc.AGILENT), через ipc.frame(). Выборки идут пачками по batch:
+# индексы всех повторностей пачки - один массив случайных чисел, средние -
+# накопленные суммы по строкам. Пачки считаются в пуле процессов, у каждой
+# свой поток случайных чисел из SeedSequence, поэтому результат не зависит
+# от числа процессов.
+#
+# Линия пересечения пары - нулевой уровень разности поверхностей d = a - b.
+# Границы полосы уровня level - нулевые уровни квантилей (1 - level) / 2 и
+# (1 + level) / 2 разности по выборкам: между ними знак d не определен с
+# этой доверительной вероятностью.
+
+RESAMPLES = 1000
+BATCH = 50
+LEVEL = 0.95
+
+
+def replicates(root=ron.DATA, exclude=ron.EXCLUDE):
+    """Повторности и оси куба ненасыщенных кислот, общие для всех выборок.
+
+    root - каталог ron (без подкаталогов exclude) или файл Arrow IPC.
+    """
+    if root.endswith('.ipc'):
+        columns = ipc.read(root)
+        frame = ipc.frame(columns)
+        offsets, times = ipc.replicates(columns)
+    else:
+        columns = ron.load(root, processes=0, exclude=exclude)
+        frame = ron.frame(columns)
+        offsets, times = columns['Time.offsets'], columns['Time']
+    counts = np.diff(offsets)
+    # Повторности без NaN подряд по строкам
+    valid = ~np.isnan(times)
+    owner = np.repeat(np.arange(len(frame)), counts)[valid]
+    counts = np.bincount(owner, minlength=len(frame))
+    # Поверхности строятся только для ненасыщенных кислот, как в pipeline
+    unsaturated = frame['DoubleBonds'].to_numpy() > 0
+    surface = frame[unsaturated]
+    surface = surface.assign(FattyAcid=surface['FattyAcid'].astype(str))
+    lattice = Cube(surface, ())
+    return {
+        'times': times[valid],
+        'owner': owner,
+        'starts': np.concatenate([[0], np.cumsum(counts)[:-1]]),
+        'counts': counts,
+        'carbons': frame['Carbons'].to_numpy(),
+        'double_bonds': frame['DoubleBonds'].to_numpy(),
+        'modes': pd.MultiIndex.from_arrays([frame['OnsetTemperature'], frame['TemperatureStep']]).factorize()[0],
+        'rows': np.flatnonzero(unsaturated),
+        'cells': np.ravel_multi_index(lattice.codes, lattice.shape),
+        'acids': lattice.acids,
+        'shape': lattice.shape,
+        'y_axis': lattice.onset_temperatures.astype(np.float64),
+        'z_axis': lattice.temperature_steps.astype(np.float64),
+    }
+
+
+def resample(data, count, seed):
+    """count выборок: кубы ECL формы (count, кислоты, T0, шаги)."""
+    rng = np.random.default_rng(seed)
+    owner, counts = data['owner'], data['counts']
+    picks = data['starts'][owner] + (rng.random((count, len(owner))) * counts[owner]).astype(np.intp)
+    # Суммы строки - разность накопленных сумм на ее границах [start,
+    # start + counts); у строки без повторностей границы совпадают
+    sums = np.zeros((count, len(owner) + 1))
+    np.cumsum(data['times'][picks], axis=1, out=sums[:, 1:])
+    totals = sums[:, data['starts'] + counts] - sums[:, data['starts']]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        times = np.where(counts > 0, totals / counts, np.nan)
+    # Все выборки - один вызов chain_lengths: режимы выборки n сдвинуты на
+    # n * (число режимов), поэтому стандарты разных выборок не смешиваются
+    modes = data['modes'][None] + (data['modes'].max() + 1) * np.arange(count)[:, None]
+    ecl = chain_lengths(
+        times.ravel(),
+        np.tile(data['carbons'], count),
+        np.tile(data['double_bonds'], count),
+        modes.ravel(),
+    )[0].reshape(count, -1)
+    cubes = np.full((count, int(np.prod(data['shape']))), np.nan)
+    cubes[:, data['cells']] = ecl[:, data['rows']]
+    return cubes.reshape(count, *data['shape'])
+
+
+def estimate(data):
+    """Куб ECL по средним всех повторностей (без выборки)."""
+    sums = np.bincount(data['owner'], weights=data['times'], minlength=len(data['counts']))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        times = np.where(data['counts'] > 0, sums / data['counts'], np.nan)
+    ecl = chain_lengths(times, data['carbons'], data['double_bonds'], data['modes'])[0]
+    cube = np.full(int(np.prod(data['shape'])), np.nan)
+    cube[data['cells']] = ecl[data['rows']]
+    return cube.reshape(data['shape'])
+
+
+def bootstrap(root=ron.DATA, resamples=RESAMPLES, level=LEVEL, batch=BATCH, processes=None, seed=0):
+    """Полосы ECL-поверхностей и линий пересечения по resamples выборкам.
+
+    processes=None - пул по числу ядер, 0 - без пула. Возвращает dict: acids,
+    y_axis, z_axis, estimate (куб ECL), lower/upper (квантили ECL по
+    выборкам) и pairs - {(кислота, кислота): {line, lower, upper}}, где
+    каждое значение - список полилиний dict(x, y, z), как у intersect().
+    """
+    data = replicates(root)
+    sizes = [min(batch, resamples - start) for start in range(0, resamples, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if processes == 0 or len(sizes) < 2:
+        parts = [resample(data, size, child) for size, child in zip(sizes, seeds)]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            parts = list(executor.map(resample, [data] * len(sizes), sizes, seeds))
+    cubes = np.concatenate(parts)
+    quantiles = [(1 - level) / 2, (1 + level) / 2]
+    center = estimate(data)
+    lower, upper = _quantiles(cubes, quantiles)
+
+    y_axis, z_axis = data['y_axis'], data['z_axis']
+    pairs = {}
+    for i, j in _pairs(center, lower, upper):
+        difference = _quantiles(cubes[:, i] - cubes[:, j], quantiles)
+        # Нулевой уровень квантиля разности: a = b + q пересекает b, x - ECL кислоты j
+        line = intersect(center[i], center[j], y_axis, z_axis)
+        low = intersect(center[j] + difference[0], center[j], y_axis, z_axis)
+        high = intersect(center[j] + difference[1], center[j], y_axis, z_axis)
+        if line or low or high:
+            pairs[(data['acids'][i], data['acids'][j])] = {'line': line, 'lower': low, 'upper': high}
+    return {
+        'acids': data['acids'], 'y_axis': y_axis, 'z_axis': z_axis,
+        'estimate': center, 'lower': lower, 'upper': upper, 'pairs': pairs,
+    }
+
+
+def traces(result, color='red'):
+    """Линии пересечения и границы их полос для 3D графика: [линии, полосы]."""
+    lines = [line for pair in result['pairs'].values() for line in pair['line']]
+    bands = [line for pair in result['pairs'].values() for line in pair['lower'] + pair['upper']]
+    return [
+        go.Scatter3d(
+            **_join(lines), mode='lines', line=dict(color=color, width=10),
+            name='Intersection', meta={'type': 'intersection'},
+        ),
+        go.Scatter3d(
+            **_join(bands), mode='lines', line=dict(color=color, width=4, dash='dash'),
+            name='Intersection band', meta={'type': 'band'},
+        ),
+    ]
+
+
+def _pairs(center, lower, upper):
+    # Пары, чьи полосы ECL [lower, upper] перекрываются хотя бы в одной
+    # ячейке решетки, и пары-кандидаты самой оценки
+    low, high = bounds(lower)[0], bounds(upper)[1]
+    count = len(low)
+    low, high = low.reshape(count, -1), high.reshape(count, -1)
+    i, j = np.triu_indices(count, 1)
+    overlap = (np.fmax(low[i], low[j]) <= np.fmin(high[i], high[j])).any(axis=1)
+    pairs = set(zip(i[overlap].tolist(), j[overlap].tolist()))
+    pairs.update(map(tuple, candidates(center).tolist()))
+    return sorted(pairs)
+
+
+def _quantiles(values, quantiles):
+    # Неизмеренные ячейки - NaN во всех выборках, без предупреждения numpy
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanquantile(values, quantiles, axis=0)
+
+
+def _join(lines):
+    # Полилинии одного трейса, разделенные разрывами (NaN)
+    return {
+        axis: np.concatenate([np.append(line[axis], np.nan) for line in lines]) if lines else []
+        for axis in 'xyz'
+    }
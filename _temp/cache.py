@@ -0,0 +1,73 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from intersection import grid
+from typed import decode
+
+# --- Серверный кэш поверхностей между вызовами callback ---
+# Данные поверхностей между нажатиями кнопки не меняются, поэтому сетки
+# решетки и триангуляции Делоне (Qhull) строятся один раз на кислоту.
+# Ключ - (кислота, версия данных); версия - хэш содержимого вершин,
+# записывается в meta трейса при создании фигуры.
+
+
+class LRU:
+    """LRU-кэш: объект строится функцией build при промахе."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, build):
+        try:
+            self._items.move_to_end(key)
+            return self._items[key]
+        except KeyError:
+            pass
+        value = build()
+        self._items[key] = value
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._items.clear()
+
+
+grids = LRU()
+triangulations = LRU()
+interpolators = LRU()
+
+
+def version(*arrays):
+    """Версия данных поверхности: хэш содержимого массивов."""
+    digest = hashlib.blake2b(digest_size=8)
+    for array in arrays:
+        digest.update(np.ascontiguousarray(decode(array)).tobytes())
+    return digest.hexdigest()
+
+
+def surface_grid(key, x, y, z):
+    """Сетка решетки (y_axis, z_axis, values) поверхности key = (кислота, версия)."""
+    return grids.get(key, lambda: grid(x, y, z))
+
+
+def surface_triangulation(key, y, z):
+    """Триангуляция Делоне точек (y, z) поверхности key."""
+    def build():
+        from scipy.spatial import Delaunay
+        return Delaunay(np.stack([decode(y), decode(z)], axis=1))
+    return triangulations.get(key, build)
+
+
+def surface_interpolator(key, x, y, z):
+    """Линейный интерполятор x = f(y, z) поверхности key поверх кэшированной триангуляции."""
+    def build():
+        from scipy.interpolate import LinearNDInterpolator
+        return LinearNDInterpolator(surface_triangulation(key, y, z), decode(x))
+    return interpolators.get(key, build)
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# --- Длины цепей ECL, FCL, ECN для всей таблицы (режим x кислота) ---
+# Повторяет ChainLengthOptions из lipid (src/app/computers/source): в каждом
+# режиме кислота интерполируется между предыдущим и следующим насыщенным
+# стандартом в порядке строк таблицы (forward/backward fill по насыщенным),
+# время - за вычетом мертвого времени, при logarithmic - его логарифм.
+# Соседние стандарты всех строк ищутся одним searchsorted по номерам строк
+# стандартов, режимы - непрерывные блоки после устойчивой сортировки.
+#
+# ECL = C0 + (t - t0) / (t1 - t0) * (C1 - C0), FCL = ECL - Carbons,
+# ECN = Carbons - 2 * DoubleBonds. Без стандарта с одной из сторон - NaN.
+
+
+def chain_lengths(time, carbons, double_bonds, modes=None, dead_time=0.0, logarithmic=False):
+    """(ECL, FCL, ECN) для каждой строки.
+
+    time - среднее время удерживания, modes - коды режимов (None - один
+    режим), dead_time - мертвое время: число или массив по строкам
+    (например, deadtime.dead_time(OnsetTemperature)).
+    """
+    time = np.asarray(time, dtype=np.float64)
+    carbons = np.asarray(carbons, dtype=np.float64)
+    double_bonds = np.asarray(double_bonds)
+    count = len(time)
+    if modes is None:
+        modes = np.zeros(count, dtype=np.intp)
+    adjusted = time - np.asarray(dead_time, dtype=np.float64)
+    if logarithmic:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            adjusted = np.log(adjusted)
+
+    # Строки режима подряд, внутри режима - исходный порядок
+    order = np.argsort(modes, kind='stable')
+    sorted_modes = np.asarray(modes)[order]
+    x = adjusted[order]
+    c = carbons[order]
+    saturated = double_bonds[order] == 0
+    standards = np.flatnonzero(saturated & ~np.isnan(x))
+    # Предыдущий (включая саму строку) и следующий стандарт того же режима
+    position = np.arange(count)
+    after = np.searchsorted(standards, position, side='right')
+    previous = standards[np.maximum(after - 1, 0)] if len(standards) else position
+    following = standards[np.minimum(after, len(standards) - 1)] if len(standards) else position
+    valid = (after > 0) & (after < len(standards))
+    valid &= (sorted_modes[previous] == sorted_modes) & (sorted_modes[following] == sorted_modes)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ecl = c[previous] + (x - x[previous]) / (x[following] - x[previous]) * (c[following] - c[previous])
+    ecl = np.where(valid, ecl, np.nan)
+    # Насыщенная кислота - ровно свое число атомов углерода, даже без времени
+    ecl[saturated] = c[saturated]
+
+    result = np.empty(count)
+    result[order] = ecl
+    ecn = carbons - 2 * double_bonds
+    return result, result - carbons, ecn.astype(np.int8)
+
+
+def frame(frame, dead_time=0.0, logarithmic=False):
+    """Столбцы EquivalentChainLength, FCL, ECN для таблицы с RetentionTime,
+    Carbons, DoubleBonds и режимом (Mode или OnsetTemperature/TemperatureStep).
+    """
+    if 'Mode' in frame:
+        modes = pd.factorize(frame['Mode'])[0]
+    else:
+        modes = pd.MultiIndex.from_arrays([frame['OnsetTemperature'], frame['TemperatureStep']]).factorize()[0]
+    ecl, fcl, ecn = chain_lengths(
+        frame['RetentionTime'].to_numpy(),
+        frame['Carbons'].to_numpy(),
+        frame['DoubleBonds'].to_numpy(),
+        modes,
+        dead_time,
+        logarithmic,
+    )
+    return pd.DataFrame({'EquivalentChainLength': ecl, 'FCL': fcl, 'ECN': ecn}, index=frame.index)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+# --- Плотный куб (кислота x OnsetTemperature x TemperatureStep) ---
+# Таблица измерений раскладывается один раз: кислоты, T0 и шаги кодируются
+# целыми номерами (factorize и unique), и каждая величина (ECL, время
+# удерживания, его стандартное отклонение) становится массивом
+# (кислоты, T0, шаги) с NaN в неизмеренных ячейках. Повторы ячейки
+# усредняются, как в pivot_table. Дальше поверхности, пересечения,
+# оптимизация и запросы по режиму обращаются к ячейкам по номерам вместо
+# pivot_table и .loc по подписям для каждой кислоты.
+
+VALUES = ('EquivalentChainLength', 'RetentionTime', 'StandardDeviation')
+
+
+class Cube:
+    """Величины values таблицы frame в осях (by, index, columns).
+
+    acids - кислоты в порядке первого появления, onset_temperatures и
+    temperature_steps - отсортированные оси, counts - число строк в ячейке,
+    mask - измеренные ячейки. Отсутствующие в frame величины пропускаются.
+    """
+
+    def __init__(self, frame, values=VALUES, by='FattyAcid', index='OnsetTemperature', columns='TemperatureStep'):
+        acid_codes, acids = pd.factorize(frame[by])
+        self.acids = list(acids)
+        self.onset_temperatures, row_codes = np.unique(frame[index].to_numpy(), return_inverse=True)
+        self.temperature_steps, column_codes = np.unique(frame[columns].to_numpy(), return_inverse=True)
+        self.shape = (len(self.acids), len(self.onset_temperatures), len(self.temperature_steps))
+        self.codes = (acid_codes, row_codes.ravel(), column_codes.ravel())
+        self._acids = {acid: n for n, acid in enumerate(self.acids)}
+        flat = np.ravel_multi_index(self.codes, self.shape)
+        size = np.prod(self.shape)
+        self.counts = np.bincount(flat, minlength=size).reshape(self.shape)
+        self.values = {}
+        for name in values:
+            if name not in frame:
+                continue
+            value = frame[name].to_numpy(dtype=np.float64)
+            valid = ~np.isnan(value)
+            sums = np.bincount(flat[valid], weights=value[valid], minlength=size)
+            counts = np.bincount(flat[valid], minlength=size)
+            with np.errstate(invalid='ignore'):
+                self.values[name] = (sums / counts).reshape(self.shape)
+        self.mask = self.counts > 0
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def __contains__(self, name):
+        return name in self.values
+
+    def acid(self, acid):
+        """Номер кислоты по подписи."""
+        return self._acids[acid]
+
+    def mode(self, onset_temperature, temperature_step):
+        """Номера (строка, столбец) режима; KeyError, если его нет на решетке."""
+        row = np.searchsorted(self.onset_temperatures, onset_temperature)
+        column = np.searchsorted(self.temperature_steps, temperature_step)
+        if (
+            row == len(self.onset_temperatures) or self.onset_temperatures[row] != onset_temperature
+            or column == len(self.temperature_steps) or self.temperature_steps[column] != temperature_step
+        ):
+            raise KeyError((onset_temperature, temperature_step))
+        return row, column
+
+    def select(self, name, acids=None):
+        """Слои величины name для кислот acids (None - все): (acids, cube)."""
+        if acids is None:
+            return self.acids, self.values[name]
+        acids = list(acids)
+        return acids, self.values[name][[self._acids[acid] for acid in acids]]
+
+    def grids(self, name='EquivalentChainLength', acids=None):
+        """Общая решетка и слои для intersection.intersect_all: (y_axis, z_axis, [values, ...])."""
+        _, values = self.select(name, acids)
+        return self.onset_temperatures.astype(np.float64), self.temperature_steps.astype(np.float64), list(values)
@@ -0,0 +1,173 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import chain
+import ipc
+from acids import FattyAcids
+
+# --- Общий загрузчик данных для скриптов Plot*.py ---
+# CSV разбирается один раз, результат хранится в Arrow IPC кэше рядом со
+# скриптами. Кэш проверяется по mtime исходного файла, а при его изменении -
+# по SHA-256 содержимого; FORMAT меняется вместе с набором столбцов кэша.
+
+SOURCE = '_temp/source.csv'
+EXPERIMENT = '_temp/experiment.csv'
+CACHE = '_temp/.cache'
+FORMAT = '2'
+
+SCHEMAS = {
+    SOURCE: {
+        'dtype': {
+            'OnsetTemperature': 'float32',
+            'TemperatureStep': 'float32',
+            'FattyAcid': 'str',
+            'EquivalentChainLength': 'float64',
+        },
+        'subset': ['EquivalentChainLength', 'OnsetTemperature', 'TemperatureStep', 'FattyAcid'],
+        'ecl': 'EquivalentChainLength',
+    },
+    EXPERIMENT: {
+        'dtype': {
+            'OnsetTemperature': 'float32',
+            'TemperatureStep': 'float32',
+            'TimeMean': 'float64',
+            'TimeStandardDeviation': 'float64',
+            'ECL': 'float64',
+            'FCL': 'float64',
+            'ECN': 'int8',
+        },
+        'subset': ['ECL', 'OnsetTemperature', 'TemperatureStep'],
+        'ecl': 'ECL',
+    },
+}
+
+
+def load_source(fractional=True):
+    """Таблица source.csv (FattyAcid, Carbons, DoubleBonds, EquivalentChainLength)."""
+    return load(SOURCE, fractional)
+
+
+def load_experiment(fractional=True):
+    """Таблица experiment.csv (TimeMean, ECL, FCL, ECN)."""
+    return load(EXPERIMENT, fractional)
+
+
+def load_measurements(path=ipc.AGILENT_SOURCE, fractional=True):
+    """Таблица измерений напрямую из Arrow IPC, без экспорта в CSV.
+
+    В файле без ChainLength (Agilent.ipc) ECL считается chain.frame() по
+    времени удерживания, линейно и без мертвого времени.
+    """
+    frame = ipc.frame(ipc.read(path))
+    if 'EquivalentChainLength' not in frame:
+        frame['EquivalentChainLength'] = chain.frame(frame)['EquivalentChainLength']
+    frame = frame.dropna(subset=[name for name in SCHEMAS[SOURCE]['subset'] if name in frame])
+    if fractional:
+        # Посчитанная ECL отличается от целой на ошибку округления (~1e-11)
+        ecl = frame['EquivalentChainLength'].to_numpy()
+        frame = frame[~np.isclose(ecl, np.round(ecl), rtol=0, atol=1e-9)]
+    frame = frame.reset_index(drop=True)
+    frame['FattyAcid'] = frame['FattyAcid'].cat.remove_unused_categories()
+    frame['Mode'] = _modes(frame['OnsetTemperature'].to_numpy(), frame['TemperatureStep'].to_numpy())
+    return frame
+
+
+def load(path, fractional=False):
+    """Очищенная таблица без пропусков; fractional оставляет только нецелые ECL."""
+    frame = _cached(path)
+    if fractional:
+        ecl = frame[SCHEMAS[path]['ecl']].to_numpy()
+        frame = frame[ecl % 1 != 0].reset_index(drop=True)
+        if 'FattyAcid' in frame:
+            frame['FattyAcid'] = frame['FattyAcid'].cat.remove_unused_categories()
+    return frame
+
+
+def _cached(path):
+    cache = os.path.join(CACHE, os.path.basename(path) + '.arrow')
+    stat = os.stat(path)
+    metadata = _metadata(cache)
+    digest = None
+    if metadata is not None and metadata.get(b'format') == FORMAT.encode():
+        if metadata.get(b'mtime') == str(stat.st_mtime_ns).encode():
+            return _read(cache)
+        digest = _digest(path)
+        if metadata.get(b'sha256') == digest.encode():
+            # Содержимое то же: новый mtime записывается, чтобы следующие
+            # загрузки не хэшировали файл заново
+            frame = _read(cache)
+            _write(cache, frame, {'mtime': str(stat.st_mtime_ns), 'sha256': digest, 'format': FORMAT})
+            return frame
+    frame = _parse(path)
+    _write(cache, frame, {
+        'mtime': str(stat.st_mtime_ns),
+        'sha256': digest or _digest(path),
+        'format': FORMAT,
+    })
+    return frame
+
+
+def _parse(path):
+    schema = SCHEMAS[path]
+    frame = pd.read_csv(path, dtype=schema['dtype'])
+    frame = frame.dropna(subset=schema['subset']).reset_index(drop=True)
+    if 'FattyAcid' in frame:
+        values = frame['FattyAcid'].to_numpy()
+        # Структура по подписи: число атомов углерода и двойных связей
+        acids = FattyAcids(values)
+        frame['FattyAcid'] = _categorical(values)
+        frame['Carbons'] = acids.carbons[acids.codes]
+        frame['DoubleBonds'] = acids.double_bonds[acids.codes]
+    frame['Mode'] = _modes(frame['OnsetTemperature'].to_numpy(), frame['TemperatureStep'].to_numpy())
+    return frame
+
+
+def _categorical(values):
+    # Категории в порядке первого появления (порядок элюирования), а не лексикографическом
+    return pd.Categorical(values, categories=pd.unique(values))
+
+
+def _modes(onset_temperatures, temperature_steps):
+    pairs = np.stack([onset_temperatures, temperature_steps], axis=1)
+    _, first, codes = np.unique(pairs, axis=0, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    categories = [f'{t:g},{s:g}' for t, s in pairs[first[order]]]
+    return pd.Categorical.from_codes(rank[codes.ravel()], categories=categories)
+
+
+def _digest(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _metadata(cache):
+    try:
+        with pa.memory_map(cache) as source:
+            return pa.ipc.open_file(source).schema.metadata or {}
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+
+
+def _read(cache):
+    with pa.memory_map(cache) as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas()
+
+
+def _write(cache, frame, metadata):
+    os.makedirs(os.path.dirname(cache), exist_ok=True)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+    temporary = cache + '.tmp'
+    with pa.OSFile(temporary, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(temporary, cache)
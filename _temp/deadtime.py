@@ -0,0 +1,32 @@
+import functools
+import os
+
+import numpy as np
+
+import ipc
+
+# --- Мертвое время tM как гладкая функция начальной температуры T0 ---
+# Таблица src/presets/agilent/DeadTime.ipc (doc/DeadTime.adoc) задает tM для
+# T0 = 60...150 C с шагом 10. По ней один раз строится полином (по умолчанию
+# квадратичный: отклонение от таблицы не больше 0.0013 мин), который
+# вычисляется для любого массива T0 одним вызовом, в том числе между узлами
+# таблицы. Модель кэшируется по пути и mtime файла.
+
+DEAD_TIME = 'src/presets/agilent/DeadTime.ipc'
+DEGREE = 2
+
+
+def dead_time(onset_temperatures, path=DEAD_TIME, degree=DEGREE):
+    """tM, мин, для каждой начальной температуры (число или массив)."""
+    return model(path, degree)(np.asarray(onset_temperatures, dtype=np.float64))
+
+
+def model(path=DEAD_TIME, degree=DEGREE):
+    """Полином tM(T0) (numpy.polynomial.Polynomial), построенный по таблице."""
+    return _fit(path, degree, os.stat(path).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=8)
+def _fit(path, degree, mtime):
+    columns = ipc.read(path)
+    return np.polynomial.Polynomial.fit(columns['OnsetTemperature'], columns['DeadTime'], degree)
@@ -0,0 +1,223 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+import deadtime
+
+# --- Попарные расстояния между кислотами в каждом режиме ---
+# Как distance::Computer в src/app/computers/distance: пары (From, To) одного
+# режима с номером строки From < To, Delta = To - From для времени
+# удерживания и ECL, Alpha = (tFrom - tM) / (tTo - tM) и евклидово расстояние
+# по (Delta RetentionTime, Delta ECL). Вместо самосоединения таблицы режимы -
+# непрерывные блоки после устойчивой сортировки, пары верхнего треугольника
+# блока строятся по частям не больше chunk строк, поэтому память
+# пропорциональна результату. С порогом по |Delta ECL| пары берутся из окон
+# searchsorted по отсортированным ECL режима.
+#
+# Критические пары (critical) - k ближайших по ECL пар каждого режима или все
+# пары с |Delta ECL| <= threshold - ищутся без таблицы расстояний: строки
+# сортируются по (режим, ECL), и ближайшие k пар режима всегда лежат среди
+# соседей со сдвигом 1...k в этом порядке (у пары со сдвигом d не меньше d
+# пар ближе нее). overlay() рисует их отрезками поверх 3D графика.
+
+CHUNK = 1 << 16
+
+COLUMNS = [
+    'OnsetTemperature', 'TemperatureStep',
+    'FattyAcid.From', 'FattyAcid.To',
+    'RetentionTime.From', 'RetentionTime.To', 'RetentionTime.Delta',
+    'EquivalentChainLength.From', 'EquivalentChainLength.To', 'EquivalentChainLength.Delta',
+    'DeadTime', 'Alpha', 'EuclideanDistance',
+]
+
+
+def distances(frame, threshold=None, chunk=CHUNK):
+    """Таблица расстояний целиком (см. chunks)."""
+    parts = list(chunks(frame, threshold, chunk))
+    if not parts:
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.concat(parts, ignore_index=True)
+
+
+def chunks(frame, threshold=None, chunk=CHUNK):
+    """Части таблицы расстояний по chunk строк (последняя - меньше).
+
+    frame - таблица с OnsetTemperature, TemperatureStep, FattyAcid,
+    EquivalentChainLength и, если есть, RetentionTime (иначе NaN) и DeadTime
+    (иначе deadtime.dead_time(OnsetTemperature)). threshold - только пары с
+    |Delta ECL| <= threshold.
+    """
+    blocks = _blocks(frame)
+    left, right = [], []
+    size = 0
+    for start, stop in blocks['bounds']:
+        pairs = _window_pairs(blocks['ecl'], start, stop, threshold) if threshold is not None else None
+        for block_left, block_right in _triangle(start, stop, chunk) if pairs is None else [pairs]:
+            left.append(block_left)
+            right.append(block_right)
+            size += len(block_left)
+            while size >= chunk:
+                left, right, size, ready = _take(left, right, chunk)
+                yield _frame(blocks, *ready)
+    if size:
+        yield _frame(blocks, np.concatenate(left), np.concatenate(right))
+
+
+def critical(frame, k=None, threshold=None):
+    """Критические пары каждого режима в формате distances().
+
+    k - k ближайших по |Delta ECL| пар режима, threshold - все пары с
+    |Delta ECL| <= threshold (вместе - k ближайших из них).
+    """
+    if k is None and threshold is None:
+        raise ValueError('k or threshold is required')
+    blocks = _blocks(frame)
+    if k is None:
+        pairs = [_window_pairs(blocks['ecl'], start, stop, threshold) for start, stop in blocks['bounds']]
+        left = np.concatenate([pair[0] for pair in pairs]) if pairs else np.empty(0, dtype=np.intp)
+        right = np.concatenate([pair[1] for pair in pairs]) if pairs else np.empty(0, dtype=np.intp)
+        return _frame(blocks, left, right)
+
+    ecl = blocks['ecl']
+    modes = np.repeat(np.arange(len(blocks['bounds'])), [stop - start for start, stop in blocks['bounds']])
+    valid = np.flatnonzero(~np.isnan(ecl))
+    order = valid[np.lexsort((ecl[valid], modes[valid]))]
+    # Соседи со сдвигом 1...k в порядке (режим, ECL)
+    first, second = [], []
+    for offset in range(1, k + 1):
+        a, b = order[:-offset], order[offset:]
+        same = modes[a] == modes[b]
+        first.append(a[same])
+        second.append(b[same])
+    a, b = np.concatenate(first), np.concatenate(second)
+    gap = ecl[b] - ecl[a]
+    if threshold is not None:
+        keep = gap <= threshold
+        a, b, gap = a[keep], b[keep], gap[keep]
+    # k наименьших в каждом режиме: ранг внутри режима после сортировки по (режим, gap)
+    ranked = np.lexsort((gap, modes[a]))
+    mode = modes[a][ranked]
+    starts = np.flatnonzero(np.r_[True, mode[1:] != mode[:-1]]) if len(mode) else np.empty(0, dtype=np.intp)
+    rank = np.arange(len(mode)) - np.repeat(starts, np.diff(np.r_[starts, len(mode)]))
+    chosen = ranked[rank < k]
+    left, right = np.minimum(a[chosen], b[chosen]), np.maximum(a[chosen], b[chosen])
+    keep = np.lexsort((right, left))
+    return _frame(blocks, left[keep], right[keep])
+
+
+def overlay(pairs, color='black', width=6):
+    """Трейс отрезков между кислотами пар (ECL, T0, шаг) для 3D графика."""
+    count = len(pairs)
+    x = np.full(3 * count, np.nan)
+    x[0::3] = pairs['EquivalentChainLength.From']
+    x[1::3] = pairs['EquivalentChainLength.To']
+    y = np.repeat(pairs['OnsetTemperature'].to_numpy(dtype=np.float64), 3)
+    z = np.repeat(pairs['TemperatureStep'].to_numpy(dtype=np.float64), 3)
+    y[2::3] = z[2::3] = np.nan
+    text = np.repeat(
+        (pairs['FattyAcid.From'].astype(str) + ' - ' + pairs['FattyAcid.To'].astype(str)).to_numpy(dtype=object), 3
+    )
+    delta = np.repeat(pairs['EquivalentChainLength.Delta'].abs().to_numpy(dtype=np.float64), 3)
+    return go.Scatter3d(
+        x=x, y=y, z=z, mode='lines',
+        line=dict(color=color, width=width),
+        text=text, customdata=delta,
+        hovertemplate=
+            '<b>%{text}</b><br><br>' +
+            'Delta ECL: %{customdata:.3f}<br>' +
+            'Onset Temperature: %{y:.2f}<br>' +
+            'Temperature Step: %{z:.2f}<extra></extra>',
+        name='Critical pairs',
+        meta={'type': 'critical'},
+    )
+
+
+def _blocks(frame):
+    modes = pd.MultiIndex.from_arrays([frame['OnsetTemperature'], frame['TemperatureStep']]).factorize()[0]
+    order = np.argsort(modes, kind='stable')
+    sorted_modes = modes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_modes[1:] != sorted_modes[:-1]])
+    stops = np.r_[starts[1:], len(order)]
+    onset = frame['OnsetTemperature'].to_numpy(dtype=np.float64)[order]
+    if 'DeadTime' in frame:
+        dead = frame['DeadTime'].to_numpy(dtype=np.float64)[order]
+    else:
+        dead = deadtime.dead_time(onset)
+    if 'RetentionTime' in frame:
+        time = frame['RetentionTime'].to_numpy(dtype=np.float64)[order]
+    else:
+        # Таблицы вроде data.load_source() - только ECL
+        time = np.full(len(order), np.nan)
+    return {
+        'bounds': list(zip(starts.tolist(), stops.tolist())),
+        'onset': onset,
+        'step': frame['TemperatureStep'].to_numpy(dtype=np.float64)[order],
+        'acid': np.asarray(frame['FattyAcid'], dtype=object)[order],
+        'time': time,
+        'ecl': frame['EquivalentChainLength'].to_numpy(dtype=np.float64)[order],
+        'dead': dead,
+    }
+
+
+def _triangle(start, stop, chunk):
+    # Верхний треугольник блока [start, stop) частями по строкам From:
+    # в каждой части не больше chunk пар (но не меньше одной строки)
+    count = stop - start
+    sizes = np.arange(count - 1, 0, -1)
+    rows = 0
+    while rows < len(sizes):
+        cumulative = np.cumsum(sizes[rows:])
+        take = max(int(np.searchsorted(cumulative, chunk, side='right')), 1)
+        lengths = sizes[rows:rows + take]
+        left = np.repeat(np.arange(rows, rows + take), lengths)
+        # Номер To: From + 1, From + 2, ... внутри каждой строки
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + 1
+        yield start + left, start + left + offsets
+        rows += take
+
+
+def _window_pairs(ecl, start, stop, threshold):
+    # Пары с |Delta ECL| <= threshold: окно [i, end) по отсортированным ECL
+    values = ecl[start:stop]
+    valid = np.flatnonzero(~np.isnan(values))
+    order = valid[np.argsort(values[valid], kind='stable')]
+    ordered = values[order]
+    ends = np.searchsorted(ordered, ordered + threshold, side='right')
+    lengths = ends - np.arange(len(order)) - 1
+    first = np.repeat(np.arange(len(order)), lengths)
+    second = first + np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + 1
+    a, b = order[first], order[second]
+    # From - строка с меньшим номером, как в самосоединении LeftIndex < RightIndex
+    left, right = np.minimum(a, b), np.maximum(a, b)
+    keep = np.lexsort((right, left))
+    return start + left[keep], start + right[keep]
+
+
+def _take(left, right, chunk):
+    left, right = np.concatenate(left), np.concatenate(right)
+    ready = left[:chunk], right[:chunk]
+    rest_left, rest_right = left[chunk:], right[chunk:]
+    return [rest_left], [rest_right], len(rest_left), ready
+
+
+def _frame(blocks, left, right):
+    time_from, time_to = blocks['time'][left], blocks['time'][right]
+    ecl_from, ecl_to = blocks['ecl'][left], blocks['ecl'][right]
+    dead = blocks['dead'][left]
+    delta_time = time_to - time_from
+    delta_ecl = ecl_to - ecl_from
+    return pd.DataFrame({
+        'OnsetTemperature': blocks['onset'][left],
+        'TemperatureStep': blocks['step'][left],
+        'FattyAcid.From': blocks['acid'][left],
+        'FattyAcid.To': blocks['acid'][right],
+        'RetentionTime.From': time_from,
+        'RetentionTime.To': time_to,
+        'RetentionTime.Delta': delta_time,
+        'EquivalentChainLength.From': ecl_from,
+        'EquivalentChainLength.To': ecl_to,
+        'EquivalentChainLength.Delta': delta_ecl,
+        'DeadTime': dead,
+        'Alpha': (time_from - dead) / (time_to - dead),
+        'EuclideanDistance': np.hypot(delta_time, delta_ecl),
+    }, copy=False)
@@ -0,0 +1,100 @@
+import numpy as np
+
+from intersection import intersect_all
+
+# --- Полиномиальные поверхности ECL(T0, шаг) для всех кислот сразу ---
+# Вместо сетки измерений с шумом каждая кислота описывается полиномом
+# степени degree от (T0, шаг), приведенных к [-1, 1] по границам решетки.
+# Матрица плана одна на все кислоты (узлы решетки x одночлены), пропуски
+# (NaN) учитываются маской весов в нормальных уравнениях, которые
+# собираются einsum и решаются одним пакетным np.linalg.solve. Системы с
+# числом обусловленности выше CONDITION (например, все измерения кислоты при
+# одном шаге) не решаются: коэффициенты такой кислоты - NaN. Значение
+# в любой точке - произведение матрицы плана точки на коэффициенты, без
+# триангуляции и поиска треугольника. Пересечения полиномов - intersect_all
+# по их значениям на решетке grids(), прогноз в режимах - predict.Predictor
+# с degree.
+
+DEGREE = 3
+CONDITION = 1e12
+
+
+class Polynomials:
+    """Полиномы x = f(y, z) для слоев cube (кислоты x y_axis x z_axis).
+
+    coefficients - (кислоты, одночлены), NaN у кислот, где измерений меньше,
+    чем одночленов, или их расположение вырождено; residuals - cube минус
+    значения полиномов в узлах.
+    Экземпляр вызывается как evaluate() из optimum: self(y, z) -> (кислоты, точки).
+    """
+
+    def __init__(self, cube, y_axis, z_axis, degree=DEGREE):
+        self.y_axis = np.asarray(y_axis, dtype=np.float64)
+        self.z_axis = np.asarray(z_axis, dtype=np.float64)
+        self.degree = degree
+        self.powers = np.array([(a, total - a) for total in range(degree + 1) for a in range(total, -1, -1)])
+        cube = np.asarray(cube, dtype=np.float64)
+        grid_y, grid_z = np.meshgrid(self.y_axis, self.z_axis, indexing='ij')
+        design = self.design(grid_y, grid_z)
+        values = cube.reshape(len(cube), -1)
+        weights = ~np.isnan(values)
+        values = np.where(weights, values, 0.0)
+        # Нормальные уравнения каждой кислоты: (X^T W X) c = X^T W v
+        normal = np.einsum('pi,np,pj->nij', design, weights, design)
+        right = np.einsum('pi,np->ni', design, values * weights)
+        determined = weights.sum(axis=1) >= len(self.powers)
+        if determined.any():
+            with np.errstate(divide='ignore', invalid='ignore'):
+                condition = np.linalg.cond(normal[determined])
+            determined[determined] = condition < CONDITION
+        self.coefficients = np.full((len(cube), len(self.powers)), np.nan)
+        if determined.any():
+            self.coefficients[determined] = np.linalg.solve(normal[determined], right[determined, :, None])[..., 0]
+        self.residuals = cube - (self.coefficients @ design.T).reshape(cube.shape)
+
+    def __call__(self, y, z):
+        return self.predict(y, z)
+
+    def design(self, y, z):
+        """Матрица плана точек (y, z): (точки, одночлены)."""
+        u = self._scale(np.asarray(y, dtype=np.float64).ravel(), self.y_axis)
+        v = self._scale(np.asarray(z, dtype=np.float64).ravel(), self.z_axis)
+        return u[:, None] ** self.powers[:, 0] * v[:, None] ** self.powers[:, 1]
+
+    def predict(self, y, z):
+        """Значения всех полиномов в точках (y, z): (кислоты, точки)."""
+        return self.coefficients @ self.design(y, z).T
+
+    def rmse(self):
+        """Среднеквадратичный остаток по измеренным узлам каждой кислоты."""
+        residuals = self.residuals.reshape(len(self.residuals), -1)
+        with np.errstate(invalid='ignore'):
+            return np.sqrt(np.nanmean(residuals ** 2, axis=1))
+
+    def grids(self, resolution=None):
+        """Значения на решетке (y_axis, z_axis, [values, ...]) для intersection.intersect_all.
+
+        resolution=(строки, столбцы) - равномерная решетка той же области
+        вместо узлов измерений.
+        """
+        if resolution is None:
+            y_axis, z_axis = self.y_axis, self.z_axis
+        else:
+            y_axis = np.linspace(self.y_axis[0], self.y_axis[-1], resolution[0])
+            z_axis = np.linspace(self.z_axis[0], self.z_axis[-1], resolution[1])
+        grid_y, grid_z = np.meshgrid(y_axis, z_axis, indexing='ij')
+        values = self.predict(grid_y, grid_z).reshape(-1, len(y_axis), len(z_axis))
+        return y_axis, z_axis, list(values)
+
+    def intersections(self, resolution=None, processes=None):
+        """Линии пересечения всех пар полиномов на решетке grids(resolution):
+        {(i, j): [полилинии]}, как у intersection.intersect_all().
+        """
+        y_axis, z_axis, values = self.grids(resolution)
+        return intersect_all(values, y_axis, z_axis, processes)
+
+    @staticmethod
+    def _scale(values, axis):
+        if axis[-1] == axis[0]:
+            return np.zeros_like(values)
+        return 2 * (values - axis[0]) / (axis[-1] - axis[0]) - 1
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+# --- Группировка строк для построения графиков ---
+# Таблица сортируется один раз по группе, после чего каждая группа - это
+# непрерывный срез отсортированной таблицы. Вместо df[df['FattyAcid'] == acid]
+# внутри цикла по кислотам - один проход O(n log n) по всем строкам.
+
+
+class Groups:
+    """Непрерывные срезы таблицы по by.
+
+    Порядок групп - порядок первого появления, как у unique(), или по
+    возрастанию значений при sort=True. Внутри группы сохраняется исходный
+    порядок строк.
+    """
+
+    def __init__(self, frame, by='FattyAcid', sort=False):
+        codes, keys = pd.factorize(frame[by], sort=sort)
+        order = np.argsort(codes, kind='stable')
+        self.frame = frame.take(order)
+        self.keys = list(keys)
+        self._bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(self.keys)))])
+        self._index = {key: code for code, key in enumerate(self.keys)}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        """(key, срез) для каждой группы."""
+        for key in self.keys:
+            yield key, self[key]
+
+    def __getitem__(self, key):
+        code = self._index[key]
+        return self.frame.iloc[self._bounds[code]:self._bounds[code + 1]]
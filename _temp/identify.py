@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+import chain
+from predict import Predictor
+
+# --- Идентификация пиков: (режим, время удерживания) -> кандидаты из библиотеки ---
+# Библиотека - таблица измерений (кислота x режим). Времена удерживания и ECL
+# всех кислот в режиме пика дает predict.Predictor: для режимов между узлами
+# решетки - интерполяция по треугольникам ячейки, как у поверхностей, по
+# заранее посчитанным коэффициентам. ECL библиотеки - собственный столбец
+# таблицы (chain.frame), в узлах совпадает с ним точно. ECL пика - его время
+# линейно между соседними по времени насыщенными стандартами режима, как в
+# chain.chain_lengths без мертвого времени (при линейной ECL оно сокращается).
+#
+# Пики группируются по режимам; для каждого режима ECL библиотеки
+# сортируются один раз, положение пика в этом индексе - число меньших ECL,
+# кандидаты - k ближайших в окне [положение - k, положение + k).
+
+K = 3
+
+
+class Library:
+    """Библиотека ECL по времени удерживания таблицы frame.
+
+    frame - таблица с FattyAcid, Carbons, DoubleBonds, OnsetTemperature,
+    TemperatureStep, RetentionTime и EquivalentChainLength (например,
+    pipeline.Pipeline().frame); без EquivalentChainLength - по chain.frame().
+    """
+
+    def __init__(self, frame):
+        if 'EquivalentChainLength' not in frame:
+            frame = frame.assign(EquivalentChainLength=chain.frame(frame)['EquivalentChainLength'])
+        self.predictor = Predictor(frame, ('RetentionTime', 'EquivalentChainLength'))
+        self.acids = np.asarray(self.predictor.acids, dtype=object)
+        # Первая строка каждой кислоты в порядке Predictor (первое появление)
+        first = np.unique(pd.factorize(frame['FattyAcid'])[0], return_index=True)[1]
+        carbons = frame['Carbons'].to_numpy()[first]
+        double_bonds = frame['DoubleBonds'].to_numpy()[first]
+        self.standards = np.flatnonzero(double_bonds == 0)
+        self.carbons = carbons[self.standards].astype(np.float64)
+
+    def retention_times(self, onset_temperatures, temperature_steps):
+        """Времена удерживания кислот в режимах: (режимы, кислоты), вне решетки - NaN."""
+        return self.predictor.predict(onset_temperatures, temperature_steps)['RetentionTime']
+
+    def chain_lengths(self, onset_temperatures, temperature_steps):
+        """ECL кислот библиотеки в режимах: (режимы, кислоты), вне решетки - NaN."""
+        return self.predictor.predict(onset_temperatures, temperature_steps)['EquivalentChainLength']
+
+    def identify(self, onset_temperatures, temperature_steps, retention_times, k=K, tolerance=None):
+        """Ранжированные кандидаты для пиков: таблица Peak, Rank, FattyAcid,
+        EquivalentChainLength (пика), Library (ECL кислоты), Distance.
+
+        Аргументы - массивы одной длины или числа; tolerance - только
+        кандидаты с Distance <= tolerance.
+        """
+        onset, step, time = np.broadcast_arrays(
+            *(np.asarray(values, dtype=np.float64).ravel() for values in (onset_temperatures, temperature_steps, retention_times))
+        )
+        modes, inverse = np.unique(np.stack([onset, step], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        predicted = self.predictor.predict(modes[:, 0], modes[:, 1])
+        library = predicted['EquivalentChainLength']
+        standards = predicted['RetentionTime'][:, self.standards]
+        peaks = _chain_lengths(time[:, None], standards[inverse], self.carbons)[:, 0]
+
+        # Отсортированный индекс каждого режима (NaN - в конце)
+        order = np.argsort(library, axis=1)
+        ordered = np.take_along_axis(library, order, axis=1)
+        counts = (~np.isnan(ordered)).sum(axis=1)
+        position = (ordered[inverse] < peaks[:, None]).sum(axis=1)
+        window = position[:, None] + np.arange(-k, k)
+        inside = (window >= 0) & (window < counts[inverse, None])
+        window = np.clip(window, 0, library.shape[1] - 1)
+        distances = np.abs(ordered[inverse[:, None], window] - peaks[:, None])
+        distances[~inside | np.isnan(distances)] = np.inf
+        best = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        distance = np.take_along_axis(distances, best, axis=1)
+        acid = order[inverse[:, None], np.take_along_axis(window, best, axis=1)]
+
+        keep = np.isfinite(distance)
+        if tolerance is not None:
+            keep &= distance <= tolerance
+        peak, rank = np.nonzero(keep)
+        return pd.DataFrame({
+            'Peak': peak,
+            'Rank': rank + 1,
+            'FattyAcid': self.acids[acid[keep]],
+            'EquivalentChainLength': peaks[peak],
+            'Library': library[inverse[peak], acid[keep]],
+            'Distance': distance[keep],
+        })
+
+
+def _chain_lengths(times, standards, carbons):
+    # ECL строк times (режимы, n) между соседними по времени стандартами
+    # своего режима standards (режимы, s) с числами углерода carbons (s,)
+    order = np.argsort(standards, axis=1)
+    standard_times = np.take_along_axis(standards, order, axis=1)
+    standard_carbons = carbons[order]
+    count = (~np.isnan(standard_times)).sum(axis=1)[:, None]
+    # Следующий стандарт; время самого стандарта попадает на край отрезка
+    following = (standard_times[:, None, :] < times[:, :, None]).sum(axis=2)
+    following = np.clip(following, 1, np.maximum(count - 1, 1))
+    last = np.take_along_axis(standard_times, np.maximum(count - 1, 0), axis=1)
+    valid = (times >= standard_times[:, :1]) & (times <= last) & (count >= 2)
+    t0 = np.take_along_axis(standard_times, following - 1, axis=1)
+    t1 = np.take_along_axis(standard_times, following, axis=1)
+    c0 = np.take_along_axis(standard_carbons, following - 1, axis=1)
+    c1 = np.take_along_axis(standard_carbons, following, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ecl = c0 + (times - t0) / (t1 - t0) * (c1 - c0)
+    return np.where(valid, ecl, np.nan)
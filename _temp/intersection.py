@@ -0,0 +1,241 @@
+import os
+
+import numpy as np
+
+from typed import decode
+
+# --- Точное пересечение кусочно-линейных поверхностей ---
+# Обе поверхности заданы на общей решетке (OnsetTemperature, TemperatureStep)
+# и разбиты на треугольники так же, как в mesh.py: каждый четырехугольник
+# (p1,p2,p3,p4) делится на (p1,p2,p3) и (p1,p3,p4). Внутри треугольника
+# разность поверхностей линейна, поэтому ее нулевой уровень - отрезок между
+# точками смены знака на двух ребрах. Точки на общих ребрах совпадают, и
+# отрезки сшиваются в полилинии по номерам ребер решетки.
+
+
+def grid(x, y, z):
+    """Вершины поверхности (x = f(y, z)) -> (y_axis, z_axis, сетка с NaN)."""
+    x, y, z = decode(x), decode(y), decode(z)
+    y_axis, rows = np.unique(y, return_inverse=True)
+    z_axis, columns = np.unique(z, return_inverse=True)
+    values = np.full((len(y_axis), len(z_axis)), np.nan)
+    values[rows.ravel(), columns.ravel()] = x
+    return y_axis, z_axis, values
+
+
+def align(*surfaces):
+    """Сетки (y_axis, z_axis, values) на общей решетке: (y_axis, z_axis, [values, ...])."""
+    y_axis = np.unique(np.concatenate([surface[0] for surface in surfaces]))
+    z_axis = np.unique(np.concatenate([surface[1] for surface in surfaces]))
+    aligned = []
+    for surface_y, surface_z, values in surfaces:
+        if np.array_equal(surface_y, y_axis) and np.array_equal(surface_z, z_axis):
+            aligned.append(values)
+            continue
+        result = np.full((len(y_axis), len(z_axis)), np.nan)
+        result[np.ix_(np.searchsorted(y_axis, surface_y), np.searchsorted(z_axis, surface_z))] = values
+        aligned.append(result)
+    return y_axis, z_axis, aligned
+
+
+def intersect(a, b, y_axis, z_axis):
+    """Линии пересечения сеток a и b: список полилиний dict(x, y, z).
+
+    x - значение поверхности (ECL), y и z - координаты решетки.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    rows, columns = a.shape
+    if rows < 2 or columns < 2:
+        return []
+    difference = a - b
+    valid = ~np.isnan(difference)
+    # Нулевые значения считаются положительными (символическое возмущение),
+    # поэтому точка пересечения никогда не попадает ровно в вершину
+    positive = difference >= 0
+    quads = valid[:-1, :-1] & valid[:-1, 1:] & valid[1:, 1:] & valid[1:, :-1]
+
+    # Ребра решетки: горизонтальные (r,c)-(r,c+1), вертикальные (r,c)-(r+1,c),
+    # диагональные (r,c)-(r+1,c+1); у каждого свой глобальный номер
+    horizontal = np.arange(rows * (columns - 1)).reshape(rows, columns - 1)
+    vertical = horizontal.size + np.arange((rows - 1) * columns).reshape(rows - 1, columns)
+    diagonal = horizontal.size + vertical.size + np.arange((rows - 1) * (columns - 1)).reshape(rows - 1, columns - 1)
+    crossing = np.concatenate([
+        (positive[:, :-1] != positive[:, 1:]).ravel(),
+        (positive[:-1, :] != positive[1:, :]).ravel(),
+        (positive[:-1, :-1] != positive[1:, 1:]).ravel(),
+    ])
+
+    # Ребра треугольников (p1,p2,p3) и (p1,p3,p4) каждого четырехугольника
+    first = np.stack([horizontal[:-1, :], vertical[:, 1:], diagonal], axis=-1)[quads]
+    second = np.stack([diagonal, horizontal[1:, :], vertical[:, :-1]], axis=-1)[quads]
+    edges = np.concatenate([first, second])
+    flags = crossing[edges]
+    cut = flags.sum(axis=1) == 2
+    segments = edges[cut][flags[cut]].reshape(-1, 2)
+    if not len(segments):
+        return []
+
+    points = _points(np.unique(segments), a, difference, y_axis, z_axis, horizontal.size, vertical.size)
+    return [
+        dict(x=points[0][chain], y=points[1][chain], z=points[2][chain])
+        for chain in _stitch(segments, points[3])
+    ]
+
+
+def _points(edges, a, difference, y_axis, z_axis, horizontal, vertical):
+    # Координаты точек смены знака на ребрах (линейная интерполяция вдоль ребра)
+    rows, columns = a.shape
+    kind = np.searchsorted([horizontal, horizontal + vertical], edges, side='right')
+    local = edges - np.array([0, horizontal, horizontal + vertical])[kind]
+    width = np.array([columns - 1, columns, columns - 1])[kind]
+    start_row, start_column = np.divmod(local, width)
+    # Горизонтальное ребро идет по столбцу, вертикальное - по строке, диагональное - по обоим
+    end_row = start_row + (kind > 0)
+    end_column = start_column + (kind != 1)
+    d0 = difference[start_row, start_column]
+    d1 = difference[end_row, end_column]
+    t = d0 / (d0 - d1)
+    x = a[start_row, start_column] + t * (a[end_row, end_column] - a[start_row, start_column])
+    y = y_axis[start_row] + t * (y_axis[end_row] - y_axis[start_row])
+    z = z_axis[start_column] + t * (z_axis[end_column] - z_axis[start_column])
+    # Плотные массивы по номеру ребра и соответствие номер ребра -> индекс точки
+    lookup = np.full(edges.max() + 1, -1, dtype=np.intp)
+    lookup[edges] = np.arange(len(edges))
+    return x, y, z, lookup
+
+
+def _stitch(segments, lookup):
+    # Каждое ребро принадлежит не более чем двум треугольникам, поэтому
+    # степень каждой точки <= 2: граф - набор цепочек и циклов
+    neighbors = {}
+    for u, v in lookup[segments].tolist():
+        neighbors.setdefault(u, []).append(v)
+        neighbors.setdefault(v, []).append(u)
+    visited = set()
+    chains = []
+    # Сначала открытые цепочки (от концов степени 1), затем замкнутые циклы
+    starts = [node for node, adjacent in neighbors.items() if len(adjacent) == 1]
+    starts += [node for node, adjacent in neighbors.items() if len(adjacent) != 1]
+    for start in starts:
+        if start in visited:
+            continue
+        chain = [start]
+        visited.add(start)
+        previous, current = None, start
+        while True:
+            following = [node for node in neighbors[current] if node != previous and node not in visited]
+            if not following:
+                if len(chain) > 2 and start in neighbors[current] and previous is not None:
+                    chain.append(start)
+                break
+            previous, current = current, following[0]
+            chain.append(current)
+            visited.add(current)
+        chains.append(np.array(chain))
+    return chains
+
+
+# --- Пересечения всех пар поверхностей ---
+# Пары, которые заведомо не пересекаются, отбрасываются по границам ECL:
+# сначала по общему диапазону поверхности (сортировка и проход по
+# интервалам), затем по min/max каждой ячейки решетки. Оставшиеся пары
+# считаются в пуле процессов.
+
+PARALLEL_PAIRS = 512
+
+_executor = None
+_workers = 0
+
+
+def bounds(grids):
+    """Min/max значений по углам каждой ячейки: (low, high) формы (n, R-1, C-1).
+
+    Ячейка без одного из углов получает NaN.
+    """
+    stack = np.asarray(grids, dtype=np.float64)
+    corners = np.stack([stack[:, :-1, :-1], stack[:, :-1, 1:], stack[:, 1:, 1:], stack[:, 1:, :-1]])
+    return corners.min(axis=0), corners.max(axis=0)
+
+
+def candidates(grids):
+    """Пары индексов (i, j), i < j, чьи поверхности могут пересекаться."""
+    low, high = bounds(grids)
+    count = len(low)
+    low = low.reshape(count, -1)
+    high = high.reshape(count, -1)
+    valid = ~np.isnan(low)
+    minimum = np.where(valid, low, np.inf).min(axis=1)
+    maximum = np.where(valid, high, -np.inf).max(axis=1)
+    # Интервалы [minimum, maximum] по возрастанию начала: пара возможна, только
+    # если начало второго интервала не правее конца первого
+    order = np.argsort(minimum, kind='stable')
+    ends = np.searchsorted(minimum[order], maximum[order], side='right')
+    first = np.repeat(np.arange(count), np.maximum(ends - np.arange(count) - 1, 0))
+    second = np.concatenate([np.arange(n + 1, end) for n, end in enumerate(ends)] or [np.empty(0, dtype=np.intp)])
+    i, j = order[first], order[second.astype(np.intp)]
+    i, j = np.minimum(i, j), np.maximum(i, j)
+    # Пересечение внутри ячейки возможно, только если диапазоны ячейки перекрываются
+    overlap = np.fmax(low[i], low[j]) <= np.fmin(high[i], high[j])
+    overlap &= valid[i] & valid[j]
+    keep = overlap.any(axis=1)
+    pairs = np.stack([i[keep], j[keep]], axis=1)
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+
+def intersect_all(grids, y_axis, z_axis, processes=None, progress=None, only=None):
+    """Линии пересечения всех пар сеток: {(i, j): [полилинии]} только для непустых.
+
+    processes=None - пул процессов при числе пар-кандидатов >= PARALLEL_PAIRS,
+    0 - без пула. progress(pair, lines, done, total) вызывается после каждой
+    посчитанной пары, в пуле - по мере готовности частей. only - номера сеток:
+    считаются только пары, в которые входит хотя бы одна из них.
+    """
+    grids = np.asarray(grids, dtype=np.float64)
+    pairs = candidates(grids)
+    if only is not None:
+        pairs = pairs[np.isin(pairs, only).any(axis=1)]
+    result = {}
+    done = 0
+
+    def collect(chunk, lines):
+        nonlocal done
+        for (i, j), pair_lines in zip(chunk.tolist(), lines):
+            done += 1
+            if pair_lines:
+                result[(int(i), int(j))] = pair_lines
+            if progress is not None:
+                progress((int(i), int(j)), pair_lines, done, len(pairs))
+
+    if processes == 0 or (processes is None and len(pairs) < PARALLEL_PAIRS):
+        for pair in pairs:
+            collect(pair[None], _intersect_pairs(grids, pair[None], y_axis, z_axis))
+    else:
+        from concurrent.futures import as_completed
+        executor = _pool(processes)
+        futures = {}
+        for chunk in np.array_split(pairs, min(_workers * 4, len(pairs)) or 1):
+            # В процесс передаются только сетки, участвующие в своей части пар
+            used, local = np.unique(chunk, return_inverse=True)
+            futures[executor.submit(_intersect_pairs, grids[used], local.reshape(chunk.shape), y_axis, z_axis)] = chunk
+        for future in as_completed(futures):
+            collect(futures[future], future.result())
+    # Порядок пар как у candidates(), независимо от порядка готовности
+    return dict(sorted(result.items()))
+
+
+def _intersect_pairs(grids, pairs, y_axis, z_axis):
+    return [intersect(grids[i], grids[j], y_axis, z_axis) for i, j in pairs]
+
+
+def _pool(processes):
+    # Пул создается один раз и переиспользуется между вызовами; _workers -
+    # его число процессов (по умолчанию, как у ProcessPoolExecutor, - по ядрам)
+    global _executor, _workers
+    if _executor is None or (processes and _workers != processes):
+        from concurrent.futures import ProcessPoolExecutor
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _workers = processes or os.cpu_count() or 1
+        _executor = ProcessPoolExecutor(max_workers=_workers)
+    return _executor
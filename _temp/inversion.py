@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from cube import Cube
+
+# --- Карта инверсий порядка элюирования по решетке режимов ---
+# Пересечение поверхностей ECL двух кислот - смена их порядка. Порядок всех
+# кислот в каждом узле решетки (T0, шаг) - одна сортировка по оси кислот куба
+# cube.Cube. Ребро решетки (соседние узлы по T0 или по шагу) содержит
+# инверсию, если перестановки в его концах различаются; только для таких
+# ребер ранги сравниваются попарно, и пара (i, j) с рангом i < j в начале
+# ребра и i > j в конце попадает в таблицу. Без интерполяции: ребро
+# отмечает ячейку, где линия пересечения пересекает решетку.
+
+
+def inversions(frame, values='EquivalentChainLength'):
+    """Ребра решетки со сменой порядка пары кислот: по строке на (ребро, пару).
+
+    frame - таблица измерений или готовый cube.Cube. Earlier - кислота,
+    выходящая раньше в начале ребра (From), Later - позже.
+    """
+    source = frame if isinstance(frame, Cube) else Cube(frame, (values,))
+    cube = source[values]
+    count, rows, columns = cube.shape
+    nodes = np.moveaxis(cube, 0, -1).reshape(-1, count)
+    valid = ~np.isnan(nodes)
+    # Порядок кислот в каждом узле (NaN - в конце) и ранг каждой кислоты.
+    # Равные значения - как нулевая разность в intersection.intersect():
+    # кислота с меньшим номером считается большей, поэтому идет позже
+    order = np.lexsort((np.broadcast_to(-np.arange(count), nodes.shape), nodes), axis=1)
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.broadcast_to(np.arange(count), order.shape), axis=1)
+
+    # Ребра: (r, c)-(r, c+1) и (r, c)-(r+1, c) в плоских номерах узлов
+    index = np.arange(rows * columns).reshape(rows, columns)
+    start = np.concatenate([index[:, :-1].ravel(), index[:-1, :].ravel()])
+    end = np.concatenate([index[:, 1:].ravel(), index[1:, :].ravel()])
+    changed = (order[start] != order[end]).any(axis=1)
+    start, end = start[changed], end[changed]
+
+    before, after = ranks[start], ranks[end]
+    both = valid[start] & valid[end]
+    swap = (
+        (before[:, :, None] < before[:, None, :])
+        & (after[:, :, None] > after[:, None, :])
+        & both[:, :, None] & both[:, None, :]
+    )
+    edge, earlier, later = np.nonzero(swap)
+    start, end = start[edge], end[edge]
+    y_axis, z_axis = source.onset_temperatures, source.temperature_steps
+    acids = np.asarray(source.acids, dtype=object)
+    return pd.DataFrame({
+        'OnsetTemperature.From': y_axis[start // columns],
+        'TemperatureStep.From': z_axis[start % columns],
+        'OnsetTemperature.To': y_axis[end // columns],
+        'TemperatureStep.To': z_axis[end % columns],
+        'FattyAcid.Earlier': acids[earlier],
+        'FattyAcid.Later': acids[later],
+        f'{values}.Earlier.From': nodes[start, earlier],
+        f'{values}.Later.From': nodes[start, later],
+        f'{values}.Earlier.To': nodes[end, earlier],
+        f'{values}.Later.To': nodes[end, later],
+    })
+
+
+def overlay(table, values='EquivalentChainLength', color='magenta', width=8):
+    """Трейс ребер с инверсиями для 3D графика (x - среднее значение пары в узле)."""
+    count = len(table)
+    x = np.full(3 * count, np.nan)
+    y = np.full(3 * count, np.nan)
+    z = np.full(3 * count, np.nan)
+    x[0::3] = (table[f'{values}.Earlier.From'] + table[f'{values}.Later.From']) / 2
+    x[1::3] = (table[f'{values}.Earlier.To'] + table[f'{values}.Later.To']) / 2
+    y[0::3], y[1::3] = table['OnsetTemperature.From'], table['OnsetTemperature.To']
+    z[0::3], z[1::3] = table['TemperatureStep.From'], table['TemperatureStep.To']
+    text = np.repeat(
+        (table['FattyAcid.Earlier'].astype(str) + ' / ' + table['FattyAcid.Later'].astype(str)).to_numpy(dtype=object), 3
+    )
+    return go.Scatter3d(
+        x=x, y=y, z=z, mode='lines',
+        line=dict(color=color, width=width),
+        text=text,
+        hovertemplate=
+            '<b>%{text}</b><br><br>' +
+            'Onset Temperature: %{y:.2f}<br>' +
+            'Temperature Step: %{z:.2f}<extra></extra>',
+        name='Elution order inversions',
+        meta={'type': 'inversion'},
+    )
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# --- Чтение таблиц Arrow IPC (Agilent.ipc, doc/Agilent source 0.1.0.ipc) ---
+# Файл отображается в память, вложенные структуры разворачиваются в плоские
+# столбцы "Mode.OnsetTemperature", "ChainLength.ECL", ... Столбцы без
+# пропусков - это numpy-представления буферов Arrow без копирования; столбцы
+# с null копируются с заменой пропусков на NaN. Списки хранятся как пары
+# (offsets, values): "RetentionTime.Absolute.Values.offsets" и
+# "RetentionTime.Absolute.Values".
+
+AGILENT = 'Agilent.ipc'
+AGILENT_SOURCE = 'doc/Agilent source 0.1.0.ipc'
+
+
+def read(path):
+    """Плоский словарь numpy-столбцов таблицы из файла IPC."""
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        if column.num_chunks != 1:
+            # Несколько record batch: склейка неизбежно копирует
+            column = column.combine_chunks()
+        else:
+            column = column.chunk(0)
+        _flatten(name, column, columns)
+    return columns
+
+
+def _flatten(name, array, columns):
+    if pa.types.is_struct(array.type):
+        for field, child in zip(array.type, array.flatten()):
+            _flatten(f'{name}.{field.name}', child, columns)
+    elif pa.types.is_list(array.type) or pa.types.is_large_list(array.type):
+        offsets = _numpy(array.offsets)
+        if offsets[0] != 0:
+            offsets = offsets - offsets[0]
+        columns[f'{name}.offsets'] = offsets
+        _flatten(name, array.flatten(), columns)
+    else:
+        columns[name] = _numpy(array)
+
+
+def _numpy(array):
+    numeric = pa.types.is_integer(array.type) or pa.types.is_floating(array.type)
+    if not numeric:
+        # Строки и прочие типы без numpy-представления буфера
+        return array.to_numpy(zero_copy_only=False)
+    if array.null_count == 0:
+        return array.to_numpy(zero_copy_only=True)
+    if pa.types.is_floating(array.type):
+        return array.to_numpy(zero_copy_only=False)
+    return array.to_numpy(zero_copy_only=False).astype(np.float64)
+
+
+def labels(columns, name='FattyAcid'):
+    """Подписи жирных кислот в формате source.csv: "{18,[{9,-1,1}, {12,-1,1}]}"."""
+    carbons = columns[f'{name}.Carbons']
+    offsets = columns[f'{name}.Unsaturated.offsets']
+    indices = columns[f'{name}.Unsaturated.Index']
+    isomerism = columns[f'{name}.Unsaturated.Isomerism']
+    unsaturation = columns[f'{name}.Unsaturated.Unsaturation']
+    bounds = [
+        f'{{{index},{isomer},{unsaturated}}}'
+        for index, isomer, unsaturated in zip(indices.tolist(), isomerism.tolist(), unsaturation.tolist())
+    ]
+    cache = {}
+    result = []
+    for row, carbon in enumerate(carbons.tolist()):
+        key = (carbon, *bounds[offsets[row]:offsets[row + 1]])
+        if key not in cache:
+            cache[key] = f'{{{carbon},[{", ".join(key[1:])}]}}'
+        result.append(cache[key])
+    return result
+
+
+def frame(columns):
+    """Таблица в формате data.load_source() поверх столбцов IPC.
+
+    Кроме кислоты (FattyAcid, Carbons, DoubleBonds), режима и RetentionTime со
+    StandardDeviation переносятся EquivalentChainLength и DeadTime, если они
+    есть в файле.
+    """
+    labels_ = labels(columns)
+    offsets = columns['FattyAcid.Unsaturated.offsets']
+    owner = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    double = columns['FattyAcid.Unsaturated.Unsaturation'] == 1
+    data = {
+        'OnsetTemperature': columns['Mode.OnsetTemperature'],
+        'TemperatureStep': columns['Mode.TemperatureStep'],
+        'FattyAcid': pd.Categorical(labels_, categories=pd.unique(np.asarray(labels_))),
+        'Carbons': columns['FattyAcid.Carbons'],
+        'DoubleBonds': np.bincount(owner[double], minlength=len(offsets) - 1).astype(np.uint8),
+    }
+    if 'ChainLength.ECL' in columns:
+        data['EquivalentChainLength'] = columns['ChainLength.ECL']
+    if 'RetentionTime.Absolute.Mean' in columns:
+        data['RetentionTime'] = columns['RetentionTime.Absolute.Mean']
+        data['StandardDeviation'] = columns['RetentionTime.Absolute.StandardDeviation']
+    else:
+        offsets, values = replicates(columns)
+        data['RetentionTime'] = means(offsets, values)
+        data['StandardDeviation'] = deviations(offsets, values)
+    if 'DeadTime' in columns:
+        data['DeadTime'] = columns['DeadTime']
+    return pd.DataFrame(data, copy=False)
+
+
+def replicates(columns):
+    """Повторности времени удерживания каждой строки: (offsets, values)."""
+    for name in ('RetentionTime.Absolute.Values', 'RetentionTime'):
+        if f'{name}.offsets' in columns:
+            return columns[f'{name}.offsets'], columns[name]
+    raise KeyError('RetentionTime')
+
+
+def means(offsets, values):
+    """Среднее каждого списка (offsets, values) без NaN, через накопленные суммы."""
+    valid = ~np.isnan(values)
+    sums = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(valid)])
+    sums = sums[offsets[1:]] - sums[offsets[:-1]]
+    counts = counts[offsets[1:]] - counts[offsets[:-1]]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def deviations(offsets, values, ddof=1):
+    """Стандартное отклонение каждого списка (offsets, values) без NaN."""
+    counts = np.diff(np.concatenate([[0], np.cumsum(~np.isnan(values))])[offsets])
+    squares = (values - np.repeat(means(offsets, values), np.diff(offsets))) ** 2
+    sums = np.concatenate([[0.0], np.cumsum(np.where(np.isnan(squares), 0.0, squares))])[offsets]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > ddof, np.sqrt(np.diff(sums) / (counts - ddof)), np.nan)
@@ -0,0 +1,91 @@
+import numpy as np
+
+from cube import Cube
+
+# --- Построение поверхностей Mesh3d по сетке (OnsetTemperature, TemperatureStep) ---
+# Для каждой жирной кислоты значения раскладываются в сетку с NaN на месте
+# отсутствующих измерений. Вершины нумеруются накопленной суммой по маске,
+# каждый четырехугольник с четырьмя измеренными углами делится на два
+# треугольника (p1,p2,p3) и (p1,p3,p4). Все кислоты обрабатываются за один
+# проход по массиву (кислоты x строки x столбцы).
+
+
+def pivot(frame, values='EquivalentChainLength', index='OnsetTemperature', columns='TemperatureStep', by='FattyAcid'):
+    """Сетка значений для всех групп сразу: (keys, index_axis, columns_axis, cube)."""
+    # Группы в порядке первого появления, как у unique(); среднее при повторах ячейки
+    cube = Cube(frame, (values,), by, index, columns)
+    return cube.acids, cube.onset_temperatures, cube.temperature_steps, cube[values]
+
+
+def triangulate(cube):
+    """Вершины и грани для каждого слоя cube[n]: список (vertices, i, j, k).
+
+    vertices - плоские индексы измеренных ячеек слоя (строка за строкой),
+    i/j/k - номера вершин треугольников. Полностью пустые строки и столбцы
+    слоя пропускаются, как при pivot_table по одной кислоте.
+    """
+    cube = np.asarray(cube)
+    count, rows, columns = cube.shape
+    mask = ~np.isnan(cube)
+    flat = mask.reshape(count, -1)
+    # Номер вершины в пределах своего слоя
+    numbers = np.cumsum(flat, axis=1) - 1
+    # Следующая непустая строка/столбец каждого слоя
+    next_rows = _next(mask.any(axis=2))
+    next_columns = _next(mask.any(axis=1))
+    layer, row, column = np.nonzero(mask)
+    next_row = next_rows[layer, row]
+    next_column = next_columns[layer, column]
+    inside = (next_row < rows) & (next_column < columns)
+    layer, row, column = layer[inside], row[inside], column[inside]
+    next_row, next_column = next_row[inside], next_column[inside]
+    quads = (
+        mask[layer, row, next_column]
+        & mask[layer, next_row, next_column]
+        & mask[layer, next_row, column]
+    )
+    layer, row, column = layer[quads], row[quads], column[quads]
+    next_row, next_column = next_row[quads], next_column[quads]
+    v1 = numbers[layer, row * columns + column]
+    v2 = numbers[layer, row * columns + next_column]
+    v3 = numbers[layer, next_row * columns + next_column]
+    v4 = numbers[layer, next_row * columns + column]
+    # Два треугольника на четырехугольник: i=[v1,v1], j=[v2,v3], k=[v3,v4]
+    i = np.repeat(v1, 2)
+    j = np.stack([v2, v3], axis=1).ravel()
+    k = np.stack([v3, v4], axis=1).ravel()
+    bounds = np.searchsorted(np.repeat(layer, 2), np.arange(count + 1))
+    vertex_bounds = np.concatenate([[0], np.cumsum(flat.sum(axis=1))])
+    vertices = np.flatnonzero(flat) % (rows * columns)
+    return [
+        (
+            vertices[vertex_bounds[n]:vertex_bounds[n + 1]],
+            i[bounds[n]:bounds[n + 1]],
+            j[bounds[n]:bounds[n + 1]],
+            k[bounds[n]:bounds[n + 1]],
+        )
+        for n in range(count)
+    ]
+
+
+def _next(keep):
+    # next[n, r] = ближайший индекс > r, где keep[n] истинно (иначе длина оси)
+    length = keep.shape[1]
+    index = np.where(keep, np.arange(length), length)
+    tail = np.minimum.accumulate(index[:, ::-1], axis=1)[:, ::-1]
+    return np.concatenate([tail[:, 1:], np.full((len(keep), 1), length)], axis=1)
+
+
+def meshes(frame, values='EquivalentChainLength', index='OnsetTemperature', columns='TemperatureStep', by='FattyAcid'):
+    """Готовые x/y/z/i/j/k для go.Mesh3d по каждой группе: {key: dict}."""
+    keys, index_axis, columns_axis, cube = pivot(frame, values, index, columns, by)
+    result = {}
+    for key, layer, (vertices, i, j, k) in zip(keys, cube, triangulate(cube)):
+        rows, cols = np.divmod(vertices, len(columns_axis))
+        result[key] = dict(
+            x=layer.ravel()[vertices],
+            y=index_axis[rows],
+            z=columns_axis[cols],
+            i=i, j=j, k=k,
+        )
+    return result
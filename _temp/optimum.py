@@ -0,0 +1,188 @@
+import functools
+
+import numpy as np
+import plotly.graph_objects as go
+
+from cube import Cube
+from fit import Polynomials
+
+# --- Поиск режима (OnsetTemperature, TemperatureStep) с лучшим разделением ---
+# Разделение в точке (T0, шаг) - минимальная |Delta ECL| между выбранными
+# кислотами: значения всех поверхностей в точке сортируются по оси кислот, и
+# берется наименьшая разность соседей. Поверхности кусочно-линейные на
+# решетке cube.Cube с тем же делением ячейки на (p1,p2,p3) и (p1,p3,p4),
+# что в mesh.py, поэтому значение в любой точке области - барицентрическая
+# интерполяция углов ее треугольника, для всех кислот и точек сразу. С
+# degree вместо решетки - полиномы fit.Polynomials (та же область).
+#
+# Сначала разделение считается на плотной сетке (она же - тепловая карта),
+# затем лучшие узлы сетки уточняются Нелдером-Мидом в границах решетки.
+# Сетка считается в пуле процессов при числе вычислений
+# (кислоты x точки) >= PARALLEL_EVALUATIONS.
+
+RESOLUTION = (181, 181)
+STARTS = 8
+CHUNK = 1 << 14
+PARALLEL_EVALUATIONS = 1 << 24
+
+
+def surfaces(frame, acids=None, values='EquivalentChainLength'):
+    """Сетки поверхностей выбранных кислот: (acids, y_axis, z_axis, cube).
+
+    frame - таблица измерений или готовый cube.Cube.
+    """
+    source = frame if isinstance(frame, Cube) else Cube(frame, (values,))
+    keys, layers = source.select(values, acids)
+    return keys, source.onset_temperatures.astype(np.float64), source.temperature_steps.astype(np.float64), layers
+
+
+def evaluate(cube, y_axis, z_axis, y, z):
+    """Значения всех поверхностей cube в точках (y, z): форма (кислоты, точки).
+
+    Вне решетки и в треугольниках без одного из углов - NaN.
+    """
+    y = np.asarray(y, dtype=np.float64).ravel()
+    z = np.asarray(z, dtype=np.float64).ravel()
+    rows = np.clip(np.searchsorted(y_axis, y, side='right') - 1, 0, len(y_axis) - 2)
+    columns = np.clip(np.searchsorted(z_axis, z, side='right') - 1, 0, len(z_axis) - 2)
+    # Доли ячейки: s - вдоль строк (T0), t - вдоль столбцов (шаг)
+    s = (y - y_axis[rows]) / (y_axis[rows + 1] - y_axis[rows])
+    t = (z - z_axis[columns]) / (z_axis[columns + 1] - z_axis[columns])
+    inside = (s >= 0) & (s <= 1) & (t >= 0) & (t <= 1)
+    v1 = cube[:, rows, columns]
+    v2 = cube[:, rows, columns + 1]
+    v3 = cube[:, rows + 1, columns + 1]
+    v4 = cube[:, rows + 1, columns]
+    # Барицентрические веса углов: (p1,p2,p3) при t >= s, иначе (p1,p3,p4).
+    # Угол с нулевым весом не участвует, поэтому точка на ребре или в узле
+    # определена и рядом с ячейкой без измерений
+    upper = t >= s
+    weights = (
+        np.where(upper, 1 - t, 1 - s),
+        np.where(upper, t - s, 0.0),
+        np.where(upper, s, t),
+        np.where(upper, 0.0, s - t),
+    )
+    result = sum(np.where(weight > 0, weight * value, 0.0) for weight, value in zip(weights, (v1, v2, v3, v4)))
+    result[np.any([(weight > 0) & np.isnan(value) for weight, value in zip(weights, (v1, v2, v3, v4))], axis=0)] = np.nan
+    result[:, ~inside] = np.nan
+    return result
+
+
+def separation(surface, y, z):
+    """Минимальная |Delta ECL| между кислотами в точках (y, z) и номера пары.
+
+    surface(y, z) -> (кислоты, точки): evaluate() над решеткой или
+    fit.Polynomials. (values, first, second); точка, где нет хотя бы одной
+    поверхности, - NaN.
+    """
+    values = surface(y, z)
+    order = np.argsort(values, axis=0)
+    ordered = np.take_along_axis(values, order, axis=0)
+    gaps = np.diff(ordered, axis=0)
+    closest = np.argmin(np.where(np.isnan(gaps), np.inf, gaps), axis=0)
+    points = np.arange(values.shape[1])
+    result = gaps[closest, points]
+    result[np.isnan(values).any(axis=0)] = np.nan
+    return result, order[closest, points], order[closest + 1, points]
+
+
+def landscape(surface, y_axis, z_axis, resolution=RESOLUTION, processes=None):
+    """Разделение на плотной сетке: (y, z, values формы (len(y), len(z)))."""
+    y = np.linspace(y_axis[0], y_axis[-1], resolution[0])
+    z = np.linspace(z_axis[0], z_axis[-1], resolution[1])
+    grid_y, grid_z = (axis.ravel() for axis in np.meshgrid(y, z, indexing='ij'))
+    chunks = [slice(start, start + CHUNK) for start in range(0, len(grid_y), CHUNK)]
+    count = surface(grid_y[:1], grid_z[:1]).shape[0]
+    if processes == 0 or (processes is None and count * len(grid_y) < PARALLEL_EVALUATIONS):
+        parts = [_separation(surface, grid_y[chunk], grid_z[chunk]) for chunk in chunks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            parts = list(executor.map(
+                _separation,
+                *zip(*((surface, grid_y[chunk], grid_z[chunk]) for chunk in chunks)),
+            ))
+    return y, z, np.concatenate(parts).reshape(len(y), len(z))
+
+
+def optimum(frame, acids=None, resolution=RESOLUTION, starts=STARTS, processes=None, degree=None):
+    """Режим с наибольшим минимальным |Delta ECL| между кислотами acids.
+
+    degree - по полиномам этой степени вместо решетки измерений. Возвращает
+    dict: OnsetTemperature, TemperatureStep, Separation, Pair (ближайшие
+    кислоты в оптимуме) и Landscape (y, z, values) - тепловая карта.
+    """
+    from scipy.optimize import minimize
+
+    keys, y_axis, z_axis, cube = surfaces(frame, acids)
+    if len(keys) < 2:
+        raise ValueError('at least two acids are required')
+    if degree is None:
+        surface = functools.partial(evaluate, cube, y_axis, z_axis)
+    else:
+        surface = Polynomials(cube, y_axis, z_axis, degree)
+    y, z, values = landscape(surface, y_axis, z_axis, resolution, processes)
+    if np.isnan(values).all():
+        raise ValueError('surfaces have no common domain')
+
+    # Уточнение от лучших узлов сетки; целевая функция негладкая (минимум
+    # модулей разностей), поэтому - симплекс без производных
+    flat = np.where(np.isnan(values), -np.inf, values).ravel()
+    best = np.argsort(flat)[::-1][:starts]
+    rows, columns = np.unravel_index(best, values.shape)
+    scale = np.array([y_axis[-1] - y_axis[0], z_axis[-1] - z_axis[0]])
+    origin = np.array([y_axis[0], z_axis[0]])
+
+    def objective(point):
+        y_point, z_point = origin + point * scale
+        value = separation(surface, [y_point], [z_point])[0][0]
+        return np.inf if np.isnan(value) else -value
+
+    point, value = np.array([y[rows[0]], z[columns[0]]]), flat[best[0]]
+    for row, column in zip(rows, columns):
+        start = (np.array([y[row], z[column]]) - origin) / scale
+        result = minimize(objective, start, method='Nelder-Mead', bounds=[(0, 1), (0, 1)])
+        if -result.fun > value:
+            point, value = origin + result.x * scale, -result.fun
+    _, first, second = separation(surface, [point[0]], [point[1]])
+    return {
+        'OnsetTemperature': point[0],
+        'TemperatureStep': point[1],
+        'Separation': value,
+        'Pair': (keys[first[0]], keys[second[0]]),
+        'Landscape': (y, z, values),
+    }
+
+
+def heatmap(result):
+    """Тепловая карта разделения с отмеченным оптимумом."""
+    y, z, values = result['Landscape']
+    fig = go.Figure(go.Heatmap(
+        x=z, y=y, z=values,
+        colorscale='Viridis', colorbar=dict(title='min |Delta ECL|'),
+        hovertemplate=
+            'Onset Temperature: %{y:.2f}<br>' +
+            'Temperature Step: %{x:.2f}<br>' +
+            'min |Delta ECL|: %{z:.4f}<extra></extra>',
+    ))
+    fig.add_trace(go.Scatter(
+        x=[result['TemperatureStep']], y=[result['OnsetTemperature']],
+        mode='markers', marker=dict(symbol='x', size=12, color='red'),
+        name='Optimum',
+        hovertext=[' - '.join(result['Pair'])],
+        hovertemplate=
+            '<b>%{hovertext}</b><br><br>' +
+            'Onset Temperature: %{y:.2f}<br>' +
+            'Temperature Step: %{x:.2f}<extra></extra>',
+    ))
+    fig.update_layout(
+        xaxis_title='Temperature Step',
+        yaxis_title='Onset Temperature',
+        margin=dict(l=0, r=0, b=0, t=40),
+    )
+    return fig
+
+
+def _separation(surface, y, z):
+    return separation(surface, y, z)[0]
@@ -0,0 +1,221 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+import chain
+import ron
+from cache import surface_grid, version
+from intersection import align, intersect_all
+from mesh import meshes
+from traces import markers, points
+from typed import compact, encode
+
+# --- Инкрементальный конвейер: файлы режимов -> ECL -> поверхности -> пересечения -> фигура ---
+# Каждый этап хранит результат вместе с версией своих входов. При изменении
+# повторностей одного режима (например, четвертая повторность 150 C, 8 C)
+# пересчитываются только строки этого режима, поверхности кислот, у которых
+# изменились вершины, пары пересечений с участием этих кислот и их трейсы в
+# фигуре. Версия режима - хэш его строк в таблице ron.load(), версия
+# поверхности - cache.version() ее вершин.
+
+class Pipeline:
+    """Состояние конвейера между вызовами update()."""
+
+    def __init__(self, root=ron.DATA, exclude=ron.EXCLUDE, processes=None):
+        self.root = root
+        self.exclude = exclude
+        self.processes = processes
+        self.frame = None
+        self.figure = None
+        self._modes = {}
+        self._surfaces = {}
+        self._lattice = None
+        self._intersections = {}
+
+    def update(self):
+        """Пересчет того, что зависит от изменившихся файлов.
+
+        Возвращает {'modes': [...], 'acids': [...], 'pairs': [...]} - что пересчитано.
+        """
+        modes = self._update_modes()
+        acids = self._update_surfaces()
+        pairs = self._update_intersections(acids)
+        self._update_figure(acids)
+        return {'modes': modes, 'acids': acids, 'pairs': pairs}
+
+    def _update_modes(self):
+        columns = ron.load(self.root, self.processes, self.exclude)
+        paths = columns['Path']
+        bounds = np.flatnonzero(np.r_[True, paths[1:] != paths[:-1], True])
+        changed = []
+        modes = {}
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            path = paths[start]
+            digest = _digest(columns, start, stop)
+            previous = self._modes.get(path)
+            if previous is not None and previous[0] == digest:
+                modes[path] = previous
+                continue
+            rows = ron.frame(_slice(columns, start, stop))
+            rows[['EquivalentChainLength', 'FCL', 'ECN']] = chain.frame(rows)
+            modes[path] = (digest, rows)
+            changed.append(path)
+        removed = set(self._modes) - set(modes)
+        self._modes = modes
+        if changed or removed or self.frame is None:
+            frame = pd.concat([rows for _, rows in modes.values()], ignore_index=True)
+            frame['FattyAcid'] = frame['FattyAcid'].astype(str)
+            frame['FattyAcid'] = pd.Categorical(frame['FattyAcid'], categories=pd.unique(frame['FattyAcid']))
+            self.frame = frame
+        return changed + sorted(removed)
+
+    def _update_surfaces(self):
+        # Поверхности пересобираются за один проход, но версия каждой
+        # кислоты сравнивается с прежней: дальше идут только изменившиеся.
+        # Как в data.load_source(): только нецелые ECL (без насыщенных стандартов)
+        ecl = self.frame['EquivalentChainLength'].to_numpy()
+        frame = self.frame[~np.isnan(ecl) & (ecl % 1 != 0)]
+        changed = []
+        surfaces = {}
+        for acid, surface in meshes(frame).items():
+            key = (acid, version(surface['x'], surface['y'], surface['z']))
+            previous = self._surfaces.get(acid)
+            if previous is not None and previous[0] == key:
+                surfaces[acid] = previous
+                continue
+            surfaces[acid] = (key, surface)
+            changed.append(acid)
+        changed.extend(sorted(set(self._surfaces) - set(surfaces)))
+        self._surfaces = surfaces
+        return changed
+
+    def _update_intersections(self, acids):
+        keys = [acid for acid, (_, surface) in self._surfaces.items() if len(surface['i'])]
+        y_axis, z_axis, grids = align(*(
+            surface_grid(key, surface['x'], surface['y'], surface['z'])
+            for key, surface in (self._surfaces[acid] for acid in keys)
+        ))
+        lattice = (y_axis.tobytes(), z_axis.tobytes())
+        if lattice != self._lattice:
+            # Другая решетка меняет сетки всех поверхностей
+            self._lattice = lattice
+            self._intersections = {}
+            only = None
+        else:
+            changed = set(acids)
+            self._intersections = {
+                pair: lines for pair, lines in self._intersections.items()
+                if not changed.intersection(pair)
+            }
+            only = [n for n, acid in enumerate(keys) if acid in changed]
+        if only is not None and not only:
+            return []
+        result = intersect_all(grids, y_axis, z_axis, self.processes, only=only)
+        pairs = [(keys[i], keys[j]) for i, j in result]
+        for (i, j), lines in result.items():
+            self._intersections[(keys[i], keys[j])] = lines
+        return pairs
+
+    def _update_figure(self, acids):
+        if self.figure is None:
+            self.figure = _figure(self.frame, self._surfaces)
+        else:
+            groups = self.frame.groupby('FattyAcid', observed=True, sort=False)
+            present = list(groups.groups)
+            wanted = {('scatter', acid) for acid in present}
+            wanted.update(('surface', acid) for acid, (_, surface) in self._surfaces.items() if len(surface['i']))
+            # Трейсы исчезнувших кислот и пустых поверхностей убираются
+            self.figure.data = [
+                trace for trace in self.figure.data
+                if trace.meta['type'] not in ('surface', 'scatter') or _key(trace) in wanted
+            ]
+            traces = {_key(trace): trace for trace in self.figure.data}
+            colors = px.colors.qualitative.Plotly
+            for n, acid in enumerate(present):
+                scatter = traces.get(('scatter', acid))
+                color = scatter.marker.color if scatter is not None else colors[n % len(colors)]
+                surface = self._surfaces.get(acid, (None, None))[1]
+                if ('surface', acid) in wanted:
+                    if ('surface', acid) not in traces:
+                        self.figure.add_trace(_surface(acid, surface, color))
+                    elif acid in acids:
+                        traces[('surface', acid)].update(surface)
+                if scatter is None:
+                    self.figure.add_trace(markers(groups.get_group(acid), acid, color, meta={'type': 'scatter', 'acid': acid}))
+                elif acid in acids:
+                    scatter.update(points(groups.get_group(acid)))
+            # Порядок как у _figure(): кислоты в порядке таблицы, пересечения - последними
+            order = {(kind, acid): n for n, (acid, kind) in enumerate(
+                (acid, kind) for acid in present for kind in ('surface', 'scatter')
+            )}
+            self.figure.data = sorted(self.figure.data, key=lambda trace: order.get(_key(trace), len(order)))
+            compact(self.figure)
+        lines = [line for pair_lines in self._intersections.values() for line in pair_lines if len(line['x']) >= 2]
+        intersection = next(trace for trace in self.figure.data if trace.meta and trace.meta['type'] == 'intersection')
+        for axis in 'xyz':
+            values = np.concatenate([np.append(line[axis], np.nan) for line in lines]) if lines else []
+            intersection[axis] = encode(values)
+
+
+def _figure(frame, surfaces):
+    fig = go.Figure()
+    colors = px.colors.qualitative.Plotly
+    groups = frame.groupby('FattyAcid', observed=True, sort=False)
+    for n, (acid, rows) in enumerate(groups):
+        color = colors[n % len(colors)]
+        surface = surfaces.get(acid, (None, None))[1]
+        if surface is not None and len(surface['i']):
+            fig.add_trace(_surface(acid, surface, color))
+        fig.add_trace(markers(rows, acid, color, meta={'type': 'scatter', 'acid': acid}))
+    fig.add_trace(go.Scatter3d(
+        x=[], y=[], z=[], mode='lines', line=dict(color='red', width=10),
+        name='Intersection', showlegend=False, meta={'type': 'intersection'},
+    ))
+    fig.update_layout(
+        scene=dict(
+            xaxis_title='Equivalent Chain Length',
+            yaxis_title='Onset Temperature',
+            zaxis_title='Temperature Step',
+        ),
+        margin=dict(l=0, r=0, b=0, t=40),
+    )
+    return compact(fig)
+
+
+def _surface(acid, surface, color):
+    return go.Mesh3d(
+        **surface, color=color, opacity=0.5,
+        legendgroup=acid, name=acid, showlegend=False, hoverinfo='none',
+        meta={'type': 'surface', 'acid': acid},
+    )
+
+
+def _key(trace):
+    # (тип, кислота) трейса фигуры _figure()
+    return trace.meta['type'], trace.meta.get('acid')
+
+
+def _slice(columns, start, stop):
+    # Строки [start, stop) плоских столбцов, включая списки (offsets, values)
+    result = {}
+    for name, values in columns.items():
+        if name.endswith('.offsets'):
+            continue
+        offsets = columns.get(name + '.offsets')
+        if offsets is None:
+            result[name] = values[start:stop]
+        else:
+            result[name] = values[offsets[start]:offsets[stop]]
+            result[name + '.offsets'] = offsets[start:stop + 1] - offsets[start]
+    return result
+
+
+def _digest(columns, start, stop):
+    digest = hashlib.blake2b(digest_size=16)
+    for name, values in sorted(_slice(columns, start, stop).items()):
+        digest.update(name.encode())
+        digest.update(values.tobytes() if values.dtype != object else '\0'.join(values).encode())
+    return digest.hexdigest()
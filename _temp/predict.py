@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+from cube import Cube
+from fit import Polynomials
+from optimum import evaluate
+
+# --- Прогноз времени удерживания, ECL и порядка элюирования в любом режиме ---
+# Поверхности кусочно-линейные на решетке измерений с тем же делением ячейки
+# на треугольники (p1,p2,p3) и (p1,p3,p4), что в mesh.py. Коэффициенты
+# f = a + b*s + c*t каждого треугольника каждой ячейки (s, t - доли ячейки
+# по T0 и шагу) считаются один раз при создании Predictor, поэтому запрос -
+# поиск ячейки (searchsorted) и одно скалярное произведение на кислоту без
+# повторной интерполяции. Порядок элюирования - ранг кислоты по времени
+# удерживания в режиме (0 - первая), без прогноза времени - -1.
+#
+# Коэффициенты треугольника без одного из углов - NaN. Точки таких
+# треугольников на ребре или в узле, у которых все углы с ненулевым весом
+# измерены, досчитываются optimum.evaluate() по тому же правилу нулевых
+# весов, поэтому прогноз в узле решетки всегда равен измерению.
+#
+# С degree вместо треугольников - полиномы fit.Polynomials той же степени:
+# значение в режиме - их явная формула, в том числе в неизмеренных узлах;
+# вне границ решетки - NaN, как и без degree.
+
+VALUES = ('RetentionTime', 'EquivalentChainLength')
+
+
+class Predictor:
+    """Кусочно-линейный или полиномиальный (degree) прогноз величин values
+    таблицы frame.
+
+    coefficients[name] - (кислоты, T0 - 1, шаги - 1, треугольник, 3),
+    NaN в треугольниках без одного из углов; polynomials[name] - полиномы
+    fit.Polynomials при degree; cubes[name] - сами сетки.
+    """
+
+    def __init__(self, frame, values=VALUES, degree=None):
+        cube = Cube(frame, values)
+        self.acids = cube.acids
+        self.y_axis = cube.onset_temperatures.astype(np.float64)
+        self.z_axis = cube.temperature_steps.astype(np.float64)
+        self.cubes = {name: cube[name] for name in values if name in cube}
+        self.degree = degree
+        if degree is None:
+            self.coefficients = {name: _coefficients(values) for name, values in self.cubes.items()}
+        else:
+            self.polynomials = {
+                name: Polynomials(values, self.y_axis, self.z_axis, degree)
+                for name, values in self.cubes.items()
+            }
+
+    def predict(self, onset_temperatures, temperature_steps):
+        """Прогноз в режимах: {величина: (режимы, кислоты)} и ElutionOrder,
+        если есть RetentionTime. Вне решетки - NaN.
+        """
+        y = np.asarray(onset_temperatures, dtype=np.float64).ravel()
+        z = np.asarray(temperature_steps, dtype=np.float64).ravel()
+        result = self._lattice(y, z) if self.degree is None else self._polynomials(y, z)
+        if 'RetentionTime' in result:
+            result['ElutionOrder'] = _ranks(result['RetentionTime'])
+        return result
+
+    def _lattice(self, y, z):
+        rows = np.clip(np.searchsorted(self.y_axis, y, side='right') - 1, 0, len(self.y_axis) - 2)
+        columns = np.clip(np.searchsorted(self.z_axis, z, side='right') - 1, 0, len(self.z_axis) - 2)
+        s = (y - self.y_axis[rows]) / (self.y_axis[rows + 1] - self.y_axis[rows])
+        t = (z - self.z_axis[columns]) / (self.z_axis[columns + 1] - self.z_axis[columns])
+        inside = (s >= 0) & (s <= 1) & (t >= 0) & (t <= 1)
+        triangle = (t < s).astype(np.intp)
+        result = {}
+        for name, coefficients in self.coefficients.items():
+            a, b, c = np.moveaxis(coefficients[:, rows, columns, triangle], -1, 0)
+            values = (a + b * s + c * t).T
+            values[~inside] = np.nan
+            missing = np.flatnonzero(np.isnan(values).any(axis=1) & inside)
+            if len(missing):
+                values[missing] = evaluate(self.cubes[name], self.y_axis, self.z_axis, y[missing], z[missing]).T
+            result[name] = values
+        return result
+
+    def _polynomials(self, y, z):
+        inside = (y >= self.y_axis[0]) & (y <= self.y_axis[-1]) & (z >= self.z_axis[0]) & (z <= self.z_axis[-1])
+        result = {}
+        for name, polynomials in self.polynomials.items():
+            values = polynomials(y, z).T
+            values[~inside] = np.nan
+            result[name] = values
+        return result
+
+    def frame(self, onset_temperatures, temperature_steps):
+        """Прогноз длинной таблицей: OnsetTemperature, TemperatureStep, FattyAcid и величины."""
+        y = np.asarray(onset_temperatures, dtype=np.float64).ravel()
+        z = np.asarray(temperature_steps, dtype=np.float64).ravel()
+        result = self.predict(y, z)
+        count = len(self.acids)
+        data = {
+            'OnsetTemperature': np.repeat(y, count),
+            'TemperatureStep': np.repeat(z, count),
+            'FattyAcid': pd.Categorical.from_codes(np.tile(np.arange(count), len(y)), categories=self.acids),
+        }
+        data.update({name: values.ravel() for name, values in result.items()})
+        return pd.DataFrame(data, copy=False)
+
+
+def _coefficients(cube):
+    # (a, b, c) треугольников (p1,p2,p3) и (p1,p3,p4) каждой ячейки
+    v1, v2 = cube[:, :-1, :-1], cube[:, :-1, 1:]
+    v3, v4 = cube[:, 1:, 1:], cube[:, 1:, :-1]
+    upper = np.stack([v1, v3 - v2, v2 - v1], axis=-1)
+    lower = np.stack([v1, v4 - v1, v3 - v4], axis=-1)
+    return np.stack([upper, lower], axis=-2)
+
+
+def _ranks(times):
+    # Ранг по времени в каждой строке (NaN сортируются в конец и получают -1)
+    order = np.argsort(times, axis=1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(times.shape[1])[None].repeat(len(times), axis=0), axis=1)
+    return np.where(np.isnan(times), -1, ranks)
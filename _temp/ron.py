@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import ipc
+from data import CACHE
+
+# --- Загрузка исходных измерений из RON (input/data/<T0>/<T0>.<шаг>.ron) ---
+# Каждый файл - сериализованный polars DataFrame: столбцы FA (Carbons,
+# Indices, Bounds, Label), OnsetTemperature, TemperatureStep и Time (список
+# повторностей). Файлы разбираются в пуле процессов и собираются в одну
+# таблицу Arrow IPC с манифестом содержимого: при повторном запуске
+# разбираются только файлы, у которых изменился SHA-256 (mtime и размер
+# проверяются первыми, чтобы не хэшировать неизмененные файлы).
+# Подкаталоги EXCLUDE не читаются: input/data/temp - побайтовые копии всех
+# режимов, и с ними каждый режим попал бы в таблицу дважды.
+
+DATA = 'input/data'
+EXCLUDE = ('temp',)
+
+_TOKEN = re.compile(r'''
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*")
+        |(?P<number>[-+]?(?:\d+\.?\d*(?:[eE][-+]?\d+)?|inf\b|NaN\b))
+        |(?P<identifier>[A-Za-z_][A-Za-z_0-9]*)
+        |(?P<punctuation>[()\[\]{},:])
+    )''', re.VERBOSE)
+
+
+def paths(root=DATA, exclude=EXCLUDE):
+    """Файлы .ron под root без подкаталогов exclude в порядке (OnsetTemperature, TemperatureStep)."""
+    found = []
+    for directory, directories, names in os.walk(root):
+        if directory == root:
+            directories[:] = [name for name in directories if name not in exclude]
+        found.extend(os.path.join(directory, name) for name in names if name.endswith('.ron'))
+    return sorted(found, key=_mode_key)
+
+
+def load(root=DATA, processes=None, exclude=EXCLUDE):
+    """Плоские numpy-столбцы всех измерений под root, как у ipc.read().
+
+    processes=None - пул процессов по числу ядер, 0 - без пула; exclude -
+    подкаталоги root, которые не читаются.
+    """
+    cache = os.path.join(CACHE, _cache_name(root, exclude) + '.arrow')
+    manifest_path = os.path.join(CACHE, _cache_name(root, exclude) + '.json')
+    files = paths(root, exclude)
+    try:
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+    entries = {}
+    changed = []
+    for path in files:
+        relative = os.path.relpath(path, root)
+        stat = os.stat(path)
+        entry = manifest.get(relative)
+        if entry is not None and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            entries[relative] = entry
+            continue
+        digest = _digest(path)
+        entries[relative] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': digest}
+        if entry is None or entry['sha256'] != digest:
+            changed.append(path)
+    if not os.path.exists(cache):
+        changed = files
+    if not changed and set(entries) == set(manifest):
+        if entries != manifest:
+            _write_manifest(manifest_path, entries)
+        return ipc.read(cache)
+
+    # Неизмененные файлы берутся из прежней таблицы, измененные разбираются заново
+    tables = {}
+    if len(changed) < len(files):
+        with pa.memory_map(cache) as source:
+            previous = pa.ipc.open_file(source).read_all()
+        sources = previous.column('Path').to_pylist()
+        bounds = np.flatnonzero(np.r_[True, np.array(sources[1:]) != np.array(sources[:-1]), True])
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            tables[sources[start]] = previous.slice(start, stop - start)
+    relatives = [os.path.relpath(path, root) for path in changed]
+    for relative, table in zip(relatives, _parse_all(changed, relatives, processes)):
+        tables[relative] = table
+    table = pa.concat_tables([tables[os.path.relpath(path, root)] for path in files]).combine_chunks()
+    _write(cache, table)
+    _write_manifest(manifest_path, entries)
+    return ipc.read(cache)
+
+
+def frame(columns):
+    """Таблица в формате data.load_source() (без ECL) поверх столбцов load()."""
+    bounds = columns['FA.Bounds']
+    offsets = columns['FA.Bounds.offsets']
+    owner = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    # Связь: модуль - кратность (2 - двойная), знак - изомерия (+ cis, - trans)
+    labels = ipc.labels({
+        'FattyAcid.Carbons': columns['FA.Carbons'],
+        'FattyAcid.Unsaturated.offsets': columns['FA.Indices.offsets'],
+        'FattyAcid.Unsaturated.Index': columns['FA.Indices'],
+        'FattyAcid.Unsaturated.Isomerism': np.sign(bounds),
+        'FattyAcid.Unsaturated.Unsaturation': np.abs(bounds) - 1,
+    })
+    return pd.DataFrame({
+        'Path': columns['Path'],
+        'OnsetTemperature': columns['OnsetTemperature'],
+        'TemperatureStep': columns['TemperatureStep'],
+        'FattyAcid': pd.Categorical(labels, categories=pd.unique(np.asarray(labels))),
+        'Carbons': columns['FA.Carbons'],
+        'DoubleBonds': np.bincount(owner[np.abs(bounds) == 2], minlength=len(offsets) - 1).astype(np.uint8),
+        'RetentionTime': ipc.means(columns['Time.offsets'], columns['Time']),
+        'StandardDeviation': ipc.deviations(columns['Time.offsets'], columns['Time']),
+    }, copy=False)
+
+
+def parse(text):
+    """Значение RON: структуры и словари -> dict, списки -> list,
+    варианты перечислений Name(...) -> (Name, [аргументы]), None -> None.
+    """
+    text = '\n'.join(line for line in text.splitlines() if not line.lstrip().startswith('#!['))
+    tokens = [
+        (match.lastgroup, match.group(match.lastgroup))
+        for match in _TOKEN.finditer(text)
+    ]
+    return _value(tokens, 0)[0]
+
+
+def table(path, relative=None):
+    """Таблица Arrow одного файла RON."""
+    with open(path, encoding='utf-8') as file:
+        columns = {column['name']: column for column in parse(file.read())['columns']}
+    fields = {field['name']: field['values'] for field in columns['FA']['values']}
+    length = len(fields['Carbons'])
+    return pa.table({
+        'Path': pa.array([relative or path] * length, pa.string()),
+        'FA': pa.StructArray.from_arrays([
+            pa.array(fields['Carbons'], pa.uint8()),
+            _list(fields['Indices'], pa.uint8()),
+            _list(fields['Bounds'], pa.int8()),
+            pa.array(fields['Label'], pa.string()),
+        ], names=['Carbons', 'Indices', 'Bounds', 'Label']),
+        'OnsetTemperature': pa.array(columns['OnsetTemperature']['values'], pa.float64()),
+        'TemperatureStep': pa.array(columns['TemperatureStep']['values'], pa.float64()),
+        'Time': _list(columns['Time']['values'], pa.float64()),
+    })
+
+
+def _value(tokens, position):
+    kind, token = tokens[position]
+    if kind == 'string':
+        return json.loads(token), position + 1
+    if kind == 'number':
+        if token.lstrip('+-') in ('inf', 'NaN') or '.' in token or 'e' in token or 'E' in token:
+            return float(token), position + 1
+        return int(token), position + 1
+    if kind == 'identifier':
+        if token == 'None':
+            return None, position + 1
+        if token in ('true', 'false'):
+            return token == 'true', position + 1
+        if position + 1 < len(tokens) and tokens[position + 1][1] == '(':
+            # Вариант перечисления или именованная структура: Name(...)
+            arguments, position = _sequence(tokens, position + 2, ')')
+            return (token, arguments), position
+        return token, position + 1
+    if token == '[':
+        return _sequence(tokens, position + 1, ']')
+    if token == '(':
+        if tokens[position + 1][0] == 'identifier' and tokens[position + 2][1] == ':':
+            return _mapping(tokens, position + 1, ')')
+        values, position = _sequence(tokens, position + 1, ')')
+        return tuple(values), position
+    if token == '{':
+        return _mapping(tokens, position + 1, '}')
+    raise ValueError(f'unexpected token {token!r}')
+
+
+def _sequence(tokens, position, close):
+    values = []
+    while tokens[position][1] != close:
+        value, position = _value(tokens, position)
+        values.append(value)
+        if tokens[position][1] == ',':
+            position += 1
+    return values, position + 1
+
+
+def _mapping(tokens, position, close):
+    values = {}
+    while tokens[position][1] != close:
+        kind, key = tokens[position]
+        key = json.loads(key) if kind == 'string' else key
+        value, position = _value(tokens, position + 2)
+        values[key] = value
+        if tokens[position][1] == ',':
+            position += 1
+    return values, position + 1
+
+
+def _list(series, dtype):
+    # Столбец списков polars: [{'values': [...]}, ...] -> ListArray
+    values = [item['values'] for item in series]
+    offsets = np.concatenate([[0], np.cumsum([len(item) for item in values])]).astype(np.int32)
+    flat = [value for item in values for value in item]
+    return pa.ListArray.from_arrays(pa.array(offsets), pa.array(flat, dtype))
+
+
+def _parse_all(paths_, relatives, processes):
+    if processes == 0 or len(paths_) < 2:
+        return [table(path, relative) for path, relative in zip(paths_, relatives)]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(table, paths_, relatives))
+
+
+def _mode_key(path):
+    # "60.10.ron" -> (60, 10): числовой, а не лексикографический порядок
+    name = os.path.basename(path)[:-len('.ron')]
+    try:
+        return (0, *map(float, name.split('.')), path)
+    except ValueError:
+        return (1, 0.0, 0.0, path)
+
+
+def _cache_name(root, exclude):
+    # Свой кэш на каждый набор исключенных подкаталогов
+    key = '\0'.join([os.path.abspath(root), *sorted(exclude)])
+    return 'ron-' + hashlib.sha256(key.encode()).hexdigest()[:12]
+
+
+def _digest(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _write(cache, table):
+    os.makedirs(os.path.dirname(cache), exist_ok=True)
+    temporary = cache + '.tmp'
+    with pa.OSFile(temporary, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(temporary, cache)
+
+
+def _write_manifest(path, entries):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(entries, file, indent=1, sort_keys=True)
+    os.replace(temporary, path)
@@ -0,0 +1,36 @@
+import plotly.graph_objects as go
+
+# --- Трейс точек кислоты для 3D графиков Plot*.py и pipeline.py ---
+# Один трейс точек на кислоту вместо трейса на каждую пару (кислота, шаг):
+# число трейсов определяет стоимость отрисовки и переключения легенды в
+# plotly сильнее, чем число точек. Шаг хранится в customdata для подсказки.
+
+
+def points(frame):
+    """Координаты точек таблицы: x - ECL, y - T0, z и customdata - шаг."""
+    return dict(
+        x=frame['EquivalentChainLength'],
+        y=frame['OnsetTemperature'],
+        z=frame['TemperatureStep'],
+        customdata=frame['TemperatureStep'],
+    )
+
+
+def markers(frame, name, color, symbols=None, meta=None, **marker):
+    """Трейс точек кислоты name.
+
+    symbols - словарь шаг -> символ маркера (без него - 'circle'), marker -
+    остальные свойства маркера поверх размера 5 и черной обводки.
+    """
+    symbol = frame['TemperatureStep'].map(symbols) if symbols is not None else 'circle'
+    return go.Scatter3d(
+        **points(frame), mode='markers',
+        marker={'size': 5, 'color': color, 'symbol': symbol, 'line': dict(color='black', width=1), **marker},
+        legendgroup=name, name=name,
+        hovertemplate=
+            '<b>%{fullData.name}</b><br><br>' +
+            'Equivalent Chain Length: %{x:.2f}<br>' +
+            'Onset Temperature: %{y:.2f}<br>' +
+            'Temperature Step: %{customdata:.2f}<extra></extra>',
+        meta=meta,
+    )
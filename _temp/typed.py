@@ -0,0 +1,67 @@
+import base64
+
+import numpy as np
+
+# --- Компактные типизированные массивы для трейсов plotly ---
+# plotly передает numpy-массивы в браузер как {'dtype', 'bdata'} (base64)
+# вместо списков чисел JSON. Координаты хранятся в float32, номера вершин
+# граней - в uint16, если вершин меньше 65536, иначе в uint32. Это
+# уменьшает и начальную загрузку Dash, и HTML от fig.show()/write_html().
+
+COORDINATES = ('x', 'y', 'z')
+FACES = ('i', 'j', 'k')
+
+
+def floats(values):
+    """Координаты в float32."""
+    return np.ascontiguousarray(decode(values), dtype=np.float32)
+
+
+def indices(*arrays):
+    """Номера вершин в наименьшем подходящем беззнаковом типе (uint16/uint32)."""
+    arrays = [np.asarray(array) for array in arrays]
+    largest = max((int(array.max()) for array in arrays if array.size), default=0)
+    dtype = np.uint16 if largest <= np.iinfo(np.uint16).max else np.uint32
+    return tuple(np.ascontiguousarray(array, dtype=dtype) for array in arrays)
+
+
+def compact(fig):
+    """Перевод координат и граней всех трейсов фигуры в компактные типы (на месте).
+
+    Числовые x, y, z любых трейсов - в float32, грани i, j, k трейсов Mesh3d
+    - в uint16/uint32, вместо списков чисел JSON. Трейсы без граней (точки,
+    линии) меняют только координаты. Фигура после compact() - только для
+    передачи в браузер: расчеты ведутся по исходным float64-данным.
+    """
+    for trace in fig.data:
+        for name in COORDINATES:
+            if name in trace and _numeric(trace[name]):
+                trace[name] = floats(trace[name])
+        if all(name in trace and trace[name] is not None for name in FACES):
+            trace.update(dict(zip(FACES, indices(*(decode(trace[name]) for name in FACES)))))
+    return fig
+
+
+def encode(values):
+    """Типизированный массив plotly {'dtype', 'bdata'} из float32-координат.
+
+    Нужен там, где данные минуют plotly (Patch, dcc.Store); NaN - разрыв линии.
+    """
+    values = floats(values)
+    return {'dtype': 'f4', 'bdata': base64.b64encode(values.tobytes()).decode('ascii')}
+
+
+def decode(values):
+    """Данные трейса в numpy: список или типизированный массив plotly {'dtype', 'bdata'}."""
+    if isinstance(values, dict):
+        values = np.frombuffer(base64.b64decode(values['bdata']), dtype=values['dtype'])
+    return np.asarray(values, dtype=np.float64)
+
+
+def _numeric(values):
+    if isinstance(values, dict):
+        return True
+    if values is None or isinstance(values, str):
+        return False
+    values = np.asarray(values)
+    return values.ndim == 1 and values.dtype.kind in 'fiu'